@@ -1 +1,4 @@
-from .backtest import BackTester
\ No newline at end of file
+from .backtest import BackTester
+from .evaluation import evaluate
+from .metrics import Running_metrics
+from .sweep import sweep, grid
\ No newline at end of file
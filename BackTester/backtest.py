@@ -1,10 +1,9 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import gridspec
+from time import perf_counter
 from BackTester import utils
-from IPython.display import display, HTML
 from Data import Trade_book
+from Profiling import recorder
 
 class BackTester():
     """
@@ -21,7 +20,9 @@ class BackTester():
         self.df_trade = None
         self.trade_book = None
 
-    def trade_one_step(self, trading_cost, utility_function, strategy, trade_book, threshold, action, epsilon=.001):
+    @recorder.timed('backtester.trade_one_step')
+    def trade_one_step(self, trading_cost, utility_function, strategy, trade_book, threshold, action, epsilon=.001,
+                       metrics=None):
         """
         trade one step forward
         :param trading_cost:
@@ -31,6 +32,7 @@ class BackTester():
         :param threshold:
         :param action:
         :param epsilon:
+        :param metrics: [None], Running_metrics to update with this step
         :return:
         """
         self.trade_book = trade_book
@@ -38,31 +40,42 @@ class BackTester():
         time_step, price, position = trade_book.get_recent_state()
         state = [price, position]
         # need to find the possible actions first
-        possible_actions = []
-        for action in action:
-            if threshold[0] <= action + position <= threshold[1]:
-                possible_actions.append(action)
-        action = strategy.epsilon_greedy(state, possible_actions, epsilon)
+        with recorder.phase('backtester.filter_actions'):
+            possible_actions = []
+            for action in action:
+                if threshold[0] <= action + position <= threshold[1]:
+                    possible_actions.append(action)
+        with recorder.phase('backtester.epsilon_greedy'):
+            action = strategy.epsilon_greedy(state, possible_actions, epsilon)
         trade_book.add_action(time_step, action)
-        self.price_process.move_forward()
+        with recorder.phase('backtester.move_forward'):
+            self.price_process.move_forward()
         # update price and position at t+1
-        next_time_step, next_price = self.price_process.get_current_price()
-        next_position = position + action
-        trade_book.add_state(next_time_step, next_price, next_position)
-        # add player's value at t
-        dv = next_position * (next_price - price) - trading_cost(action)
-        utility = utility_function(dv)
-        trade_book.add_value(time_step, dv)
-        trade_book.add_utility(time_step, utility)
+        with recorder.phase('backtester.record'):
+            next_time_step, next_price = self.price_process.get_current_price()
+            next_position = position + action
+            trade_book.add_state(next_time_step, next_price, next_position)
+            # add player's value at t
+            cost = trading_cost(action)
+            dv = next_position * (next_price - price) - cost
+            utility = utility_function(dv)
+            trade_book.add_value(time_step, dv)
+            trade_book.add_utility(time_step, utility)
+            if metrics is not None:
+                metrics.update(price, position, next_price, next_position, dv, cost)
 
 
-    def backtest(self, total_time=None, initial_value=1e5, threshold=None, action=None, ):
+    def backtest(self, total_time=None, initial_value=1e5, threshold=None, action=None, metrics=None,
+                 trade_log=None):
         """
         backtest for a certain time steps
         :param total_time: int, time steps
         :param initial_value: float, initial total cash for trading
         :param threshold: position threshold, if None get player.threshold
         :param action: action space, if None get player.action
+        :param metrics: [None], Running_metrics to update at every step
+        :param trade_log: [None], Trade_log the trade book is appended to after the backtest, except the last state,
+                          whose action is not known yet, the next backtest starts from it
         :return:
         """
         # if time == None, get price_process's total_time
@@ -79,28 +92,158 @@ class BackTester():
         if not action:
             action = self.player.action
 
-        # get the last state from training trade_book
-        trade_book = Trade_book()
-        trade_book.add_state(0, self.price_process.current_price, 0)
+        # get the last state from training trade_book, with room for the whole backtest
+        trade_book = Trade_book(chunk_size=total_time + 1)
+        time_step, price = self.price_process.get_current_price()
+        trade_book.add_state(time_step, price, 0)
         # trade with epsilon 0
         for i in range(total_time):
             self.trade_one_step(self.player.trading_cost, self.player.utility_function, self.player.strategy,
-                                trade_book, threshold, action, epsilon=.001)
+                                trade_book, threshold, action, epsilon=.001, metrics=metrics)
+
+        if trade_log is not None:
+            trade_log.append(trade_book)
 
         # convert the trade book to a dataframe
-        book = trade_book.book
-        df_trade = pd.DataFrame([book[i]['state'] for i in sorted(list(book))])
+        book = trade_book.to_arrays()
+        self.df_trade = self._trade_frame(book['price'], book['position'], book['value'], initial_value)
 
-        # compute stock, cash and total value
-        df_trade.loc[:, "stock"] = df_trade.loc[:, "price"] * df_trade.loc[:, "position"]
-        df_trade.loc[:, "trading_cost"] = self.player.trading_cost(df_trade.position.diff())
+    async def live_backtest(self, feed, initial_value=1e5, threshold=None, action=None, metrics=None,
+                            epsilon=.001, executor=None):
+        """
+        backtest on ticks pushed by a live feed instead of the price process,
+        the action decided at a tick is filled at the next tick that reaches the loop,
+        decisions run in an executor so the feed keeps receiving, and dropping by its policy, meanwhile
+        :param feed: BackTester.live.Tick_feed
+        :param initial_value: float, initial total cash for trading
+        :param threshold: position threshold, if None get player.threshold
+        :param action: action space, if None get player.action
+        :param metrics: [None], Running_metrics to update at every step
+        :param epsilon: float probability to trade randomly
+        :param executor: [None], concurrent.futures executor of the decisions, None for the loop's default
+        :return: dict with ticks traded, ticks received and dropped by the feed,
+                 and latency, the seconds from receiving each tick to its decision
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        threshold = threshold or self.player.threshold
+        action = action or self.player.action
+        strategy = self.player.strategy
+
+        trade_book = Trade_book()
+        self.trade_book = trade_book
+        latency = []
+        decision = None
+        tick = await feed.get()
+        while tick is not None:
+            time_step, price, received = tick
+            if decision is None:
+                trade_book.add_state(time_step, price, 0)
+            else:
+                # fill the previous decision at this tick's price
+                previous_time, previous_price, position = trade_book.get_recent_state()
+                next_position = position + decision
+                cost = self.player.trading_cost(decision)
+                dv = next_position * (price - previous_price) - cost
+                trade_book.add_value(previous_time, dv)
+                trade_book.add_utility(previous_time, self.player.utility_function(dv))
+                if metrics is not None:
+                    metrics.update(previous_price, position, price, next_position, dv, cost)
+                trade_book.add_state(time_step, price, next_position)
+            position = trade_book.get_recent_state()[2]
+            possible_actions = [a for a in action if threshold[0] <= a + position <= threshold[1]]
+            with recorder.phase('backtester.live_decision'):
+                decision = await loop.run_in_executor(executor, strategy.epsilon_greedy, [price, position],
+                                                      possible_actions, epsilon)
+            trade_book.add_action(time_step, decision)
+            latency.append(perf_counter() - received)
+            tick = await feed.get()
+
+        book = trade_book.to_arrays()
+        self.df_trade = self._trade_frame(book['price'], book['position'], book['value'], initial_value)
+        return {'ticks': len(latency), 'received': feed.received, 'dropped': feed.dropped,
+                'latency': np.array(latency)}
+
+    def fast_backtest(self, q_table, total_time=None, initial_value=1e5, threshold=None, action=None):
+        """
+        backtest a frozen greedy policy compiled into a Q table,
+        the price path is generated first and then traded with table lookups only
+        :param q_table: Q_table compiled from the player's learner
+        :param total_time: int, time steps
+        :param initial_value: float, initial total cash for trading
+        :param threshold: position threshold, if None get player.threshold
+        :param action: action space, if None get player.action
+        :return:
+        """
+        if not total_time:
+            try:
+                total_time = self.price_process.total_time
+            except AttributeError:
+                pass
+
+        if not threshold:
+            threshold = self.player.threshold
+
+        if not action:
+            action = self.player.action
+
+        # generate the price path
+        time_steps = np.zeros(total_time + 1, dtype=np.int64)
+        price = np.zeros(total_time + 1)
+        time_steps[0], price[0] = self.price_process.get_current_price()
+        for i in range(1, total_time + 1):
+            self.price_process.move_forward()
+            time_steps[i], price[i] = self.price_process.get_current_price()
+
+        # trade along the path with the greedy action of each grid state
+        q_table = q_table.restrict(action)
+        # every position the backtest can reach from 0, in moves of the greatest common divisor of the actions,
+        # the table grid may be coarser and is looked up at the nearest grid position
+        lot = np.gcd.reduce(np.abs(q_table.actions).astype(int)) or 1
+        positions = lot * np.arange(np.ceil(threshold[0] / lot), np.floor(threshold[1] / lot) + 1)
+        policy = q_table.policy(threshold, positions)
+        price_index = q_table.price_index(price).tolist()
+        position_index = {p: j for j, p in enumerate(positions.tolist())}
+        position = np.zeros(total_time + 1)
+        current_position = 0.
+        for i in range(total_time):
+            current_position += policy[price_index[i], position_index[current_position]]
+            position[i + 1] = current_position
+
+        # value and utility at t, nothing is known about the last step
+        trades = np.diff(position)
+        dv = position[1:] * np.diff(price) - self.player.trading_cost(trades)
+        value = np.r_[dv, np.nan]
+        self.trade_book = Trade_book.from_arrays(time_steps, price, position, np.r_[trades, np.nan], value,
+                                                 np.r_[self.player.utility_function(dv), np.nan])
+        self.df_trade = self._trade_frame(price, position, value, initial_value)
+
+    def _trade_frame(self, price, position, value, initial_value):
+        """
+        build the performance data frame of a backtest
+        :param price: array of prices
+        :param position: array of positions
+        :param value: array of changes in value, nan if missing
+        :param initial_value: float, initial total cash for trading
+        :return: DataFrame
+        """
         # note that action is made based on current price
-        d_cash = (df_trade.price.shift() * df_trade.position.diff()).fillna(0) + df_trade.trading_cost
-        df_trade.loc[:, "cash"] = initial_value - d_cash.cumsum()
-        #df_trade.loc[:, "value"] = df_trade.loc[:, "stock"] + df_trade.loc[:, "cash"]
-        df_trade.loc[:, "value"] = pd.Series([book[i].get('value', np.nan) for i in sorted(list(book))]).fillna(0).cumsum() + initial_value
+        trade = np.r_[np.nan, np.diff(position)]
+        trading_cost = self.player.trading_cost(trade)
+        d_cash = np.r_[np.nan, price[:-1]] * trade
+        d_cash = np.where(np.isnan(d_cash), 0., d_cash) + trading_cost
+        # a missing change in cash leaves a gap in the cumulative sum, as pandas does
+        cum_d_cash = np.nancumsum(d_cash)
+        cum_d_cash[np.isnan(d_cash)] = np.nan
 
-        self.df_trade = df_trade
+        # compute stock, cash and total value
+        df_trade = pd.DataFrame({'price': price,
+                                 'position': position,
+                                 'stock': price * position,
+                                 'trading_cost': trading_cost,
+                                 'cash': initial_value - cum_d_cash,
+                                 'value': np.cumsum(np.where(np.isnan(value), 0., value)) + initial_value})
+        return df_trade
 
     def plot(self, figsize=(10,10)):
         """
@@ -113,6 +256,10 @@ class BackTester():
         if self.df_trade is None:
             self.backtest()
 
+        # plotting is only loaded when used, so headless runs do not import matplotlib
+        import matplotlib.pyplot as plt
+        from matplotlib import gridspec
+
         # create fig
         fig = plt.figure(figsize=figsize)
         gs = gridspec.GridSpec(2, 1, height_ratios=[3, 1])
@@ -161,6 +308,7 @@ class BackTester():
 
         # display in html format
         if html_print:
+            from IPython.display import display, HTML
             display(HTML(df_summary.to_html()))
 
         return df_summary
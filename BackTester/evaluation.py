@@ -0,0 +1,120 @@
+import os
+import copy
+import inspect
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Data import Trade_book
+from Simulation import Random_mixture_process
+from Simulation import Random_source
+
+metrics_dtype = [('sharpe', float), ('pnl', float), ('turnover', float)]
+
+# state of a worker process, set once by _init_worker
+_worker = {}
+
+
+def default_process(rng=None):
+    """
+    the out of sample price process used by evaluate
+    :param rng: [None], Random_source of the process
+    :return: Random_mixture_process
+    """
+    return Random_mixture_process(prob_list=[.25, .25, .25, .25], p0=50, start_t=0, rng=rng)
+
+
+def _fresh_player(player):
+    """
+    copy a player for one path, the fitted supervised learners are shared instead of copied
+    :param player: Player
+    :return: Player
+    """
+    memo = {id(player.price_process): None}
+    for sl in getattr(player.strategy.learner, 'supervised_learners', ()):
+        memo[id(sl)] = sl
+    return copy.deepcopy(player, memo)
+
+
+def run_path(player, seed, process_factory=default_process, test_size=1000, epsilon=0.01, initial_value=1000000):
+    """
+    trade one out of sample path with a copy of the player
+    :param player: Player, trained market player, it is not changed
+    :param seed: int or array of uint32, seed of the path's random stream
+    :param process_factory: callable that returns a new price process, called with rng=the path's Random_source
+                            if it takes an rng argument, otherwise the rng of the new process is replaced
+    :param test_size: int, time steps of the path
+    :param epsilon: float probability to trade randomly
+    :param initial_value: float, portfolio value the returns are computed on
+    :return: tuple of sharpe, pnl, turnover
+    """
+    player = _fresh_player(player)
+    # the copied strategy would replay the trained player's exploration stream on every path
+    process_rng, strategy_rng = Random_source(np.random.SeedSequence(seed)).spawn(2)
+    if 'rng' in inspect.signature(process_factory).parameters:
+        player.price_process = process_factory(rng=process_rng)
+    else:
+        player.price_process = process_factory()
+        if hasattr(player.price_process, 'rng'):
+            player.price_process.rng = process_rng
+    # the learner draws its picks and perturbations from the strategy's stream
+    player.strategy.rng = strategy_rng
+    time_step, price = player.price_process.get_current_price()
+    player.trade_book = Trade_book(chunk_size=test_size + 1)
+    player.trade_book.add_state(time_step, price, 0)
+    player.last_transition = None
+    for _ in range(test_size):
+        player.trade_greedy_one_step(epsilon)
+
+    book = player.trade_book.to_arrays()
+    returns = book['value'][:-1] / initial_value
+    sharpe = np.mean(returns) / np.std(returns) * np.sqrt(252)
+    turnover = np.abs(np.diff(book['position'])).sum() / 2.
+    return sharpe, returns.sum() * initial_value, turnover
+
+
+def _init_worker(player, process_factory, test_size, epsilon, initial_value):
+    """
+    keep the player and the evaluation settings in the worker process
+    """
+    _worker.update(player=player, process_factory=process_factory, test_size=test_size,
+                   epsilon=epsilon, initial_value=initial_value)
+
+
+def _run_worker_path(seed):
+    """
+    trade one path with the player of the worker process
+    """
+    return run_path(seed=seed, **_worker)
+
+
+def evaluate(player, n_paths=200, test_size=1000, process_factory=default_process, seed=0, n_jobs=None,
+             epsilon=0.01, initial_value=1000000):
+    """
+    evaluate a trained player on many independent out of sample paths,
+    every path has its own seeded random stream, so the result does not depend on n_jobs
+    the player's learner is frozen during the evaluation, weights only move inside each path's copy
+    :param player: Player, trained market player
+    :param n_paths: int, number of paths
+    :param test_size: int, time steps of each path
+    :param process_factory: callable that returns a new price process, must be picklable unless processes fork
+    :param seed: int, seed of the whole evaluation
+    :param n_jobs: [None], int number of worker processes, None for all cpus, 1 to run in this process
+    :param epsilon: float probability to trade randomly
+    :param initial_value: float, portfolio value the returns are computed on
+    :return: structured array of n_paths rows with fields sharpe, pnl, turnover
+    """
+    player.wait_strategy()
+    seeds = [child.generate_state(4) for child in np.random.SeedSequence(seed).spawn(n_paths)]
+    n_jobs = n_jobs or os.cpu_count()
+
+    if n_jobs == 1:
+        results = [run_path(player, s, process_factory, test_size, epsilon, initial_value) for s in seeds]
+    else:
+        # forked workers inherit the player, so lambdas in it do not need to be pickled
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=context, initializer=_init_worker,
+                                 initargs=(player, process_factory, test_size, epsilon, initial_value)) as executor:
+            results = list(executor.map(_run_worker_path, seeds, chunksize=max(1, n_paths // (4 * n_jobs))))
+
+    return np.array(results, dtype=metrics_dtype)
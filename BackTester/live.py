@@ -0,0 +1,174 @@
+"""
+live feed mode: ticks are pushed by a source instead of pulled with move_forward,
+a local replay server streams a recorded path over a socket so the whole path can be tested offline
+"""
+import asyncio
+from collections import deque
+from time import perf_counter
+import numpy as np
+
+
+class Tick_feed:
+    """
+    bounded asyncio queue of (time, price, received) ticks between a source and a trading loop,
+    what happens when the trading loop falls behind is set by the policy:
+    'block' makes the source wait (backpressure), 'drop_oldest' drops the oldest queued tick,
+    'coalesce' also hands the trading loop only the newest tick and drops the stale ones
+    """
+    policies = ('block', 'drop_oldest', 'coalesce')
+
+    def __init__(self, maxsize=1, policy='block'):
+        """
+        initialize an instance of tick feed
+        :param maxsize: int, number of ticks the queue holds
+        :param policy: str, 'block', 'drop_oldest' or 'coalesce'
+        """
+        if policy not in self.policies:
+            raise ValueError('policy must be one of {}, got {}'.format(self.policies, policy))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.ticks = deque()
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self._changed = asyncio.Condition()
+
+    async def put(self, time_step, price):
+        """
+        add a tick as it arrives
+        :param time_step: int time
+        :param price: float price
+        """
+        async with self._changed:
+            self.received += 1
+            if self.policy == 'block':
+                await self._changed.wait_for(lambda: len(self.ticks) < self.maxsize)
+            elif len(self.ticks) >= self.maxsize:
+                self.ticks.popleft()
+                self.dropped += 1
+            self.ticks.append((time_step, price, perf_counter()))
+            self._changed.notify_all()
+
+    async def get(self):
+        """
+        wait for the next tick
+        :return: tuple of time, price and the perf_counter time it was received, None once the feed is closed
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.ticks or self.closed)
+            if not self.ticks:
+                return None
+            if self.policy == 'coalesce':
+                self.dropped += len(self.ticks) - 1
+                tick = self.ticks.pop()
+                self.ticks.clear()
+            else:
+                tick = self.ticks.popleft()
+            self._changed.notify_all()
+            return tick
+
+    async def close(self):
+        """
+        mark the end of the feed, queued ticks are still handed out
+        """
+        async with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+
+
+class Replay_server:
+    """
+    local tcp server that streams a recorded path, one 'time,price' line per tick
+    """
+
+    def __init__(self, times, prices, host='127.0.0.1', port=0, interval=0.):
+        """
+        initialize an instance of replay server
+        :param times: int array of time steps
+        :param prices: float array of prices
+        :param host: str, address to listen on
+        :param port: int, port to listen on, 0 for any free port
+        :param interval: float, seconds between ticks, 0 to stream as fast as the client reads
+        """
+        self.times = times
+        self.prices = prices
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.server = None
+
+    @classmethod
+    def from_process(cls, price_process, n_steps, **kwargs):
+        """
+        record a path of a price process and serve it
+        :param price_process: a price process, it is moved forward n_steps
+        :param n_steps: int, number of steps after the current price
+        :return: Replay_server
+        """
+        times, prices = np.zeros(n_steps + 1, dtype=np.int64), np.zeros(n_steps + 1)
+        for i in range(n_steps + 1):
+            if i:
+                price_process.move_forward()
+            times[i], prices[i] = price_process.get_current_price()
+        return cls(times, prices, **kwargs)
+
+    async def start(self):
+        """
+        start listening, the port is set once the server is up
+        """
+        self.server = await asyncio.start_server(self._stream, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _stream(self, reader, writer):
+        for time_step, price in zip(self.times, self.prices):
+            writer.write('{},{}\n'.format(int(time_step), float(price)).encode())
+            # waits while the client's socket buffer is full
+            await writer.drain()
+            if self.interval:
+                await asyncio.sleep(self.interval)
+        writer.close()
+        await writer.wait_closed()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def read_ticks(feed, host, port):
+    """
+    read 'time,price' lines from a socket into a feed until the stream ends, then close the feed
+    :param feed: Tick_feed
+    :param host: str, address of the server
+    :param port: int, port of the server
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        async for line in reader:
+            time_step, price = line.decode().split(',')
+            await feed.put(int(time_step), float(price))
+    finally:
+        writer.close()
+        await feed.close()
+
+
+async def replay(backtester, times, prices, maxsize=1, policy='block', interval=0., **kwargs):
+    """
+    stream a recorded path through a local replay server into backtester.live_backtest
+    :param backtester: BackTester
+    :param times: int array of time steps
+    :param prices: float array of prices
+    :param maxsize: int, number of ticks the feed holds
+    :param policy: str, policy of the Tick_feed
+    :param interval: float, seconds between ticks
+    :param kwargs: passed on to live_backtest
+    :return: report of live_backtest
+    """
+    server = Replay_server(times, prices, interval=interval)
+    await server.start()
+    feed = Tick_feed(maxsize, policy)
+    try:
+        _, report = await asyncio.gather(read_ticks(feed, server.host, server.port),
+                                         backtester.live_backtest(feed, **kwargs))
+    finally:
+        await server.close()
+    return report
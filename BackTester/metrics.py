@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class Running_metrics:
+    """
+    performance metrics of BackTester.print updated one step at a time in constant memory,
+    the value is marked to market after each step
+    the conventions of print on its trade frame are kept, so both give the same numbers:
+    the value series starts after the first step, the first step has no return and the last step a zero return,
+    the cost of a trade is divided by the value one step after the trade
+    """
+
+    def __init__(self, initial_value=1e5, af=250):
+        """
+        initialize an instance of running metrics
+        :param initial_value: float, initial total value of the portfolio
+        :param af: int, annualization factor
+        """
+        self.initial_value = initial_value
+        self.af = af
+        self.value = initial_value
+        self.steps = 0
+        # running mean and variance of returns
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+        # running peak and max draw down
+        self.peak = None
+        self.max_dd = 0.
+        self.turnover = 0.
+        self.all_bet = 0
+        self.pos_bet = 0
+        self.cost_sum = 0.
+        self.last_cost = None
+
+    def update(self, price, position, next_price, next_position, value_change, trading_cost):
+        """
+        add one step from t to t+1
+        :param price: float price at t
+        :param position: position at t
+        :param next_price: float price at t+1
+        :param next_position: position at t+1
+        :param value_change: float change in value of the portfolio
+        :param trading_cost: float cost of the trade at t
+        """
+        self.steps += 1
+        if self.steps > 1:
+            self._add_return(value_change / self.value)
+        self.value += value_change
+
+        self.peak = self.value if self.peak is None else max(self.peak, self.value)
+        self.max_dd = max(self.max_dd, 1. - self.value / self.peak)
+
+        action = next_position - position
+        self.turnover += abs(action) / 2.
+        # same bet counting as utils.compute_hitrate
+        if abs(next_position) >= 1e-6:
+            self.all_bet += 1
+            if action * (next_price - price) > 1e-6:
+                self.pos_bet += 1
+
+        # the cost of the previous trade is divided by the value after this step
+        if self.last_cost is not None:
+            self.cost_sum += self.last_cost / self.value
+        self.last_cost = trading_cost
+
+    def _add_return(self, rtn):
+        """
+        add one return to the running mean and variance
+        """
+        self.count += 1
+        delta = rtn - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (rtn - self.mean)
+
+    def _returns(self):
+        """
+        count, mean and sum of squared deviations of the returns with the zero return of the last step
+        """
+        if self.steps == 0:
+            return 0, 0., 0.
+        count = self.count + 1
+        mean = self.mean - self.mean / count
+        return count, mean, self.m2 + self.mean * mean
+
+    @property
+    def vol(self):
+        """
+        sample standard deviation of returns
+        """
+        count, _, m2 = self._returns()
+        return np.sqrt(m2 / (count - 1)) if count > 1 else np.nan
+
+    @property
+    def cost_rate(self):
+        """
+        mean cost of a trade relative to the value
+        """
+        if self.steps == 0:
+            return np.nan
+        return (self.cost_sum + self.last_cost / self.value) / self.steps
+
+    @property
+    def sharpe(self):
+        """
+        annualized sharpe ratio
+        """
+        return self._returns()[1] * self.af / (self.vol * np.sqrt(self.af))
+
+    def summary(self):
+        """
+        performance stats under the same names as BackTester.print
+        :return: dict
+        """
+        return {"annualized return": self._returns()[1] * self.af,
+                "annualized vol": self.vol * np.sqrt(self.af),
+                "sharp ratio": self.sharpe,
+                "hit rate": self.pos_bet / self.all_bet if self.all_bet else np.nan,
+                "turnover": self.turnover,
+                "annualized cost rate": self.cost_rate * self.af,
+                "max drawdown": min(self.max_dd, 1.)}
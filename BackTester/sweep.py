@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import itertools
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Simulation import Random_mixture_process
+from Simulation import Generic_functions
+from Simulation import Random_source
+from Data import Player
+from Model import Strategy
+from Model import SLA
+from Model import RWM
+from Model import FTPL
+from .evaluation import evaluate
+
+# the settings of Test/main.py, every key can be swept
+default_config = {'model': 'ftpl', 'gamma': 0.999, 'beta': .995, 'eps': .05, 'backend': 'gbr',
+                  'epsilon': .9, 'decay': .9, 'size': 1000, 'iterations': 20,
+                  'action': [-200, -100, 0, 100, 200], 'threshold': [-1000, 1000],
+                  'p0': 70, 'prob_list': [.25, .25, .25, .25],
+                  'cost_mul': 10, 'tick_size': 0.1, 'risk_aversion': 0.0001,
+                  'n_paths': 200, 'test_size': 1000, 'test_epsilon': 0.01}
+
+
+def grid(**params):
+    """
+    every combination of the given values on top of the default config
+    :param params: name=list of values, e.g. gamma=[.99, .999], model=['rwm', 'ftpl']
+    :return: list of config dicts
+    """
+    unknown = set(params) - set(default_config)
+    if unknown:
+        raise ValueError('unknown parameters: {}'.format(sorted(unknown)))
+    names = sorted(params)
+    combinations = itertools.product(*(params[name] for name in names))
+    return [dict(default_config, **dict(zip(names, values))) for values in combinations]
+
+
+def config_key(config, seed):
+    """
+    :param config: dict of settings
+    :param seed: int seed
+    :return: str, sha256 of the config and seed, the name of the cached result
+    """
+    text = json.dumps({'config': config, 'seed': seed}, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def make_learner(config):
+    """
+    :param config: dict of settings
+    :return: SLA, RWM or FTPL learner
+    """
+    if config['model'] == 'sla':
+        return SLA(backend=config['backend'])
+    if config['model'] == 'rwm':
+        return RWM(beta=config['beta'], backend=config['backend'])
+    if config['model'] == 'ftpl':
+        return FTPL(eps=config['eps'], backend=config['backend'])
+    raise ValueError('unknown model: {}'.format(config['model']))
+
+
+def train_player(config, seed):
+    """
+    train a player as Test/main.py does: iterations of size steps with a decaying epsilon,
+    each followed by a strategy update
+    :param config: dict of settings
+    :param seed: int seed of the price process and the exploration
+    :return: Player
+    """
+    process_rng, strategy_rng = Random_source(seed).spawn(2)
+    process = Random_mixture_process(p0=config['p0'], prob_list=config['prob_list'], rng=process_rng)
+    player = Player(price_process=process,
+                    utility_function=functools.partial(Generic_functions.utility_function, k=config['risk_aversion']),
+                    trading_cost=functools.partial(Generic_functions.trading_cost, mul=config['cost_mul'],
+                                                   ts=config['tick_size']),
+                    strategy=Strategy(make_learner(config), rng=strategy_rng), gamma=config['gamma'],
+                    action=list(config['action']), threshold=tuple(config['threshold']), model=config['model'])
+    for j in range(config['iterations']):
+        for _ in range(config['size']):
+            player.trade_greedy_one_step(config['epsilon'] * config['decay'] ** j)
+        player.update_strategy(config['size'], 1)
+    return player
+
+
+def run_config(config, seed):
+    """
+    train a player and evaluate it out of sample
+    :param config: dict of settings
+    :param seed: int seed
+    :return: dict of results
+    """
+    start = time.perf_counter()
+    player = train_player(config, seed)
+    train_sec = time.perf_counter() - start
+    results = evaluate(player, n_paths=config['n_paths'], test_size=config['test_size'], seed=seed, n_jobs=1,
+                       epsilon=config['test_epsilon'])
+    return {'sharpe': float(results['sharpe'].mean()), 'sharpe_std': float(results['sharpe'].std()),
+            'pnl': float(results['pnl'].mean()), 'turnover': float(results['turnover'].mean()),
+            'train_sec': train_sec, 'evaluate_sec': time.perf_counter() - start - train_sec}
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save(path, record):
+    """
+    write a result in one step, so an interrupted sweep never leaves a partial file behind
+    """
+    with open(path + '.tmp', 'w') as f:
+        json.dump(record, f, indent=2, default=str)
+    os.replace(path + '.tmp', path)
+
+
+def sweep(configs, seeds=(0,), cache_dir='sweep_cache', n_jobs=None):
+    """
+    run every config with every seed in a process pool, results are cached on disk by config and seed,
+    so a rerun or a resumed sweep only runs the missing cells
+    :param configs: list of config dicts, e.g. from grid
+    :param seeds: list of int seeds
+    :param cache_dir: str, directory of the cached results
+    :param n_jobs: [None], int number of worker processes, None for all cpus, 1 to run in this process
+    :return: DataFrame, one row per config and seed with the swept settings, the seed and the results
+    """
+    import pandas as pd
+    os.makedirs(cache_dir, exist_ok=True)
+    cells = {}
+    for config, seed in itertools.product(configs, seeds):
+        cells[config_key(config, seed)] = (config, seed)
+    records = {key: _load(os.path.join(cache_dir, key + '.json')) for key in cells
+               if os.path.exists(os.path.join(cache_dir, key + '.json'))}
+    missing = [key for key in cells if key not in records]
+
+    def done(key, results):
+        config, seed = cells[key]
+        records[key] = {'config': config, 'seed': seed, 'results': results}
+        _save(os.path.join(cache_dir, key + '.json'), records[key])
+
+    n_jobs = n_jobs or os.cpu_count()
+    if n_jobs == 1 or len(missing) <= 1:
+        for key in missing:
+            done(key, run_config(*cells[key]))
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(missing)), mp_context=context) as executor:
+            futures = {executor.submit(run_config, *cells[key]): key for key in missing}
+            for future in as_completed(futures):
+                done(futures[future], future.result())
+
+    # only the settings that differ between configs are columns
+    swept = [name for name in default_config
+             if len({json.dumps(config[name], default=str) for config, _ in cells.values()}) > 1]
+    rows = []
+    for key, (config, seed) in cells.items():
+        row = {name: config[name] for name in swept}
+        row.update(seed=seed, key=key, cached=key not in missing)
+        row.update(records[key]['results'])
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -1,4 +1,6 @@
 from .player import Player
 from .trade_book import Trade_book
+from .trade_log import Trade_log
+from .population import Population
 
-__all__ = ['Player', 'Trade_book']
+__all__ = ['Player', 'Trade_book', 'Trade_log', 'Population']
@@ -1,6 +1,7 @@
 import numpy as np
 import time
 from .trade_book import Trade_book
+from Profiling import recorder
 
 
 class Player:
@@ -11,7 +12,8 @@ class Player:
     """
 
     def __init__(self, price_process, utility_function, trading_cost, strategy, gamma = 0.999,
-                 action=[-200, -100, 0, 100, 200], threshold=(-1000, 1000), model='rwm'):
+                 action=[-200, -100, 0, 100, 200], threshold=(-1000, 1000), model='rwm', metrics=None,
+                 trade_log=None):
         """
         initialize an instance of player in the stock market
         :param price_process: a price process that mimics the behavior of a stock
@@ -20,6 +22,10 @@ class Player:
         :param strategy: the RL strategy of the player
         :param gamma: [0.8], float, speed of diminishing utility
         :param action: list of possible movement of position
+        :param model: str, 'rwm' or 'ftpl' to adjust the ensemble weights each step,
+                      'online' to update the learner with each Sarsa transition
+        :param metrics: [None], Running_metrics updated at every step
+        :param trade_log: [None], Trade_log the trade book is written to before it is cleaned
         """
         self.price_process = price_process
         self.utility_function = utility_function
@@ -33,6 +39,11 @@ class Player:
         self.utility = {}
         self.threshold = threshold
         self.model = model
+        self.pending_update = None
+        self.metrics = metrics
+        self.trade_log = trade_log
+        # state, action and utility at t-1, waiting for the action at t to complete the Sarsa transition
+        self.last_transition = None
 
     def progress(self):
         """
@@ -40,45 +51,65 @@ class Player:
         """
         self.price_process.move_forward()
 
+    @recorder.timed('player.trade_greedy_one_step')
     def trade_greedy_one_step(self, epsilon=.05):
         """
         trade one step forward
         """
+        # swap in the learner trained in the background once it is ready
+        if self.pending_update is not None and self.pending_update.done():
+            self.wait_strategy()
         # get the player's state at t
         time_step, price, position = self.trade_book.get_recent_state()
         state = [price, position]
         # need to find the possible actions first
-        possible_actions = []
-        for action in self.action:
-            if self.threshold[0] <= action + position <= self.threshold[1]:
-                possible_actions.append(action)
-        action = self.strategy.epsilon_greedy(state, possible_actions, epsilon)
+        with recorder.phase('player.filter_actions'):
+            possible_actions = []
+            for action in self.action:
+                if self.threshold[0] <= action + position <= self.threshold[1]:
+                    possible_actions.append(action)
+        with recorder.phase('player.epsilon_greedy'):
+            action = self.strategy.epsilon_greedy(state, possible_actions, epsilon)
         self.trade_book.add_action(time_step, action)
-        self.progress()
+        if self.model == 'online' and self.last_transition is not None:
+            with recorder.phase('player.online_update'):
+                self.strategy.learner.update(*self.last_transition, state, action, self.gamma)
+        with recorder.phase('player.move_forward'):
+            self.progress()
         # update price and position at t+1
-        next_time_step, next_price = self.price_process.get_current_price()
-        next_position = position + action
-        self.trade_book.add_state(next_time_step, next_price, next_position)
-        # add player's utility at t
-        dv = next_position * (next_price - price) - self.trading_cost(action)
-        utility = self.utility_function(dv)
-        self.trade_book.add_value(time_step, dv)
-        self.trade_book.add_utility(time_step, utility)
+        with recorder.phase('player.record'):
+            next_time_step, next_price = self.price_process.get_current_price()
+            next_position = position + action
+            self.trade_book.add_state(next_time_step, next_price, next_position)
+            # add player's utility at t
+            cost = self.trading_cost(action)
+            dv = next_position * (next_price - price) - cost
+            utility = self.utility_function(dv)
+            self.trade_book.add_value(time_step, dv)
+            self.trade_book.add_utility(time_step, utility)
+            if self.metrics is not None:
+                self.metrics.update(price, position, next_price, next_position, dv, cost)
+        if self.model == 'online':
+            self.last_transition = (state, action, utility)
         if self.model == 'rwm':
             # todo: should use the learners' action as possible actions
             # todo: implement the method to find possible action from leaners
             action_list = self.strategy.learner.previous_guess
             if action_list is not None:
-                _, utility_array = self.feedback_best_action(action_list, next_price - price, position)
-                self.strategy.learner.adjust_weight(utility_array)
+                with recorder.phase('player.feedback_best_action'):
+                    _, utility_array = self.feedback_best_action(action_list, next_price - price, position)
+                with recorder.phase('player.adjust_weight'):
+                    self.strategy.learner.adjust_weight(utility_array)
 
         if self.model == 'ftpl':
             # todo: find best utility and other utility
             # todo: use utility as loss function
             action_list = self.strategy.learner.previous_guess
             if action_list is not None:
-                _, utility_array = self.feedback_best_action(action_list, next_price - price, position)
-                self.strategy.learner.adjust_weight(utility_array)
+                with recorder.phase('player.feedback_best_action'):
+                    _, utility_array = self.feedback_best_action(action_list, next_price - price, position)
+                with recorder.phase('player.adjust_weight'):
+                    self.strategy.learner.adjust_weight(utility_array)
 
 
     def feedback_best_action(self, possible_actions, delta_price, postion):
@@ -95,20 +126,41 @@ class Player:
             utility[i] = self.utility_function(dv)
         return possible_actions[np.argmax(utility)], utility
 
-    def update_strategy(self, look_back=50000, length_of_state=1):
+    def update_strategy(self, look_back=50000, length_of_state=1, executor=None):
         """
         update Q function in strategy based on past observations
         :param look_back: int, number of steps to look back
         :param length_of_state: [1], number of steps to take as one state
+        :param executor: [None], concurrent.futures executor, if given the new learner is fitted there
+                         while the player keeps trading with the current learner
+        :return: Future of the new supervised learner if executor is given, else None
         """
-        trade_book = self.trade_book.book
-        self.strategy.upgrade(trade_book, self.gamma)
+        # only one update in flight, so learners are added in order
+        self.wait_strategy()
+        if executor is None:
+            self.strategy.upgrade(self.trade_book, self.gamma)
+        else:
+            self.pending_update = self.strategy.upgrade_async(self.trade_book, self.gamma, executor)
         self._clean_trade_book()
+        return self.pending_update
+
+    def wait_strategy(self):
+        """
+        wait for the update running in the background and add its learner to the strategy
+        """
+        if self.pending_update is None:
+            return
+        sl = self.pending_update.result()
+        self.pending_update = None
+        if sl is not None:
+            self.strategy.learner.add_learner(sl)
 
     def _clean_trade_book(self):
         """
         clean trade book so that it only contains the most recent state
         """
+        if self.trade_log is not None:
+            self.trade_log.append(self.trade_book)
         time_step, price, position = self.trade_book.get_recent_state()
         self.trade_book.clear()
         self.trade_book.add_state(time_step, price, position)
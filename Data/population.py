@@ -0,0 +1,93 @@
+import numpy as np
+from .trade_book import Trade_book
+from Profiling import recorder
+
+
+class Population:
+    """
+    many market players with the same strategy trading independent paths of one price process in lockstep,
+    states are held as arrays and all agents decide with one batched learner call per step,
+    the learner is frozen during the run
+    """
+
+    def __init__(self, price_process, utility_function, trading_cost, strategy, n_agents=100,
+                 action=[-200, -100, 0, 100, 200], threshold=(-1000, 1000)):
+        """
+        initialize an instance of population
+        :param price_process: a price process with simulate, every agent starts from its current state
+        :param utility_function: the utility function of the players, applied to arrays
+        :param trading_cost: the trading cost function, applied to arrays
+        :param strategy: Strategy whose learner has predict_batch, its rng draws the exploration
+        :param n_agents: int, number of players
+        :param action: list of possible movement of position
+        :param threshold: tuple of lowest and highest position
+        """
+        self.price_process = price_process
+        self.utility_function = utility_function
+        self.trading_cost = trading_cost
+        self.strategy = strategy
+        self.n_agents = n_agents
+        self.action = np.asarray(action)
+        self.threshold = threshold
+        self.book = None
+
+    @recorder.timed('population.run')
+    def run(self, n_steps, epsilon=0.01):
+        """
+        trade n_steps forward with every agent
+        :param n_steps: int, number of time steps
+        :param epsilon: float probability to trade randomly
+        :return: dict of arrays, time (n_steps + 1) and price, position, action, value, utility
+                 (n_agents, n_steps + 1), the last action, value and utility are nan as in Trade_book
+        """
+        time_step, price = self.price_process.get_current_price()
+        n = self.n_agents
+        with recorder.phase('population.simulate'):
+            paths = self.price_process.simulate(n, n_steps)
+        book = {'time': time_step + np.arange(n_steps + 1),
+                'price': np.column_stack((np.full(n, price, dtype=float), paths)),
+                'position': np.zeros((n, n_steps + 1))}
+        for name in ('action', 'value', 'utility'):
+            book[name] = np.full((n, n_steps + 1), np.nan)
+
+        learner, rng = self.strategy.learner, self.strategy.rng
+        for t in range(n_steps):
+            position = book['position'][:, t]
+            with recorder.phase('population.decide'):
+                allowed = position[:, None] + self.action
+                mask = (self.threshold[0] <= allowed) & (allowed <= self.threshold[1])
+                states = np.column_stack((book['price'][:, t], position))
+                action = learner.predict_batch(states, self.action, mask).astype(float)
+                explore = rng.uniforms(n) < epsilon
+                if explore.any():
+                    random_id = np.argmax(rng.uniforms((n, len(self.action))) * mask, axis=1)
+                    action = np.where(explore, self.action[random_id], action)
+            with recorder.phase('population.record'):
+                next_position = position + action
+                dv = next_position * (book['price'][:, t + 1] - book['price'][:, t]) - self.trading_cost(action)
+                book['position'][:, t + 1] = next_position
+                book['action'][:, t] = action
+                book['value'][:, t] = dv
+                book['utility'][:, t] = self.utility_function(dv)
+        self.book = book
+        return book
+
+    def trade_book(self, i):
+        """
+        the trade book of one agent
+        :param i: int, index of the agent
+        :return: Trade_book
+        """
+        return Trade_book.from_arrays(self.book['time'], self.book['price'][i], self.book['position'][i],
+                                      self.book['action'][i], self.book['value'][i], self.book['utility'][i])
+
+    def summary(self, initial_value=1000000):
+        """
+        performance of every agent over the last run, computed as in BackTester.evaluate
+        :param initial_value: float, portfolio value the returns are computed on
+        :return: dict of arrays sharpe, pnl, turnover
+        """
+        returns = self.book['value'][:, :-1] / initial_value
+        return {'sharpe': returns.mean(axis=1) / returns.std(axis=1) * np.sqrt(252),
+                'pnl': returns.sum(axis=1) * initial_value,
+                'turnover': np.abs(np.diff(self.book['position'], axis=1)).sum(axis=1) / 2.}
@@ -1,27 +1,109 @@
-from collections import defaultdict
+import numpy as np
 
 
 class Trade_book:
     """
     keep a record of all the transactions and the net worth
-    Trade_book has date:{'state':{'price':float, 'position':float}, 'action':int, 'utility':float}
+    Trade_book stores one row per time step in preallocated columns:
+    time, price, position, action, value, utility (missing entries are nan)
     """
-    def __init__(self):
+    columns = ('time', 'price', 'position', 'action', 'value', 'utility')
+
+    def __init__(self, chunk_size=4096, capacity=None):
         """
         initialize an instance of trade book
+        :param chunk_size: int, number of rows added each time the columns grow
+        :param capacity: [None], int, if given keep only the most recent capacity rows (ring buffer)
         """
-        self.book = defaultdict(dict)
+        self.chunk_size = chunk_size
+        self.capacity = capacity
+        self._columns = self._allocate(2 * capacity if capacity else chunk_size)
+        self._start = 0
+        self._stop = 0
         self.recent_time = None
 
+    @classmethod
+    def from_arrays(cls, time, price, position, action=None, value=None, utility=None):
+        """
+        build a trade book from columns, the data is copied
+        :param time: int array of time steps in increasing order
+        :param price: float array of prices
+        :param position: float array of positions
+        :param action: [None], float array of actions, nan if missing
+        :param value: [None], float array of changes in value, nan if missing
+        :param utility: [None], float array of utilities, nan if missing
+        :return: Trade_book
+        """
+        n = len(time)
+        trade_book = cls(chunk_size=max(n, 1))
+        given = {'time': time, 'price': price, 'position': position,
+                 'action': action, 'value': value, 'utility': utility}
+        for name, column in given.items():
+            if column is not None:
+                trade_book._columns[name][:n] = column
+        trade_book._stop = n
+        trade_book.recent_time = int(time[-1]) if n else None
+        return trade_book
+
+    @staticmethod
+    def _allocate(size):
+        """
+        allocate empty columns
+        :param size: int, number of rows
+        :return: dict of column name: array
+        """
+        columns = {'time': np.zeros(size, dtype=np.int64)}
+        for name in Trade_book.columns[1:]:
+            columns[name] = np.full(size, np.nan)
+        return columns
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def _make_room(self):
+        """
+        make sure one more row can be appended at the end
+        """
+        size = len(self._columns['time'])
+        if self.capacity:
+            # drop the oldest row, and move the window back to the front once it hits the end
+            if self._stop - self._start >= self.capacity:
+                self._start += 1
+            if self._stop == size:
+                n = self._stop - self._start
+                for column in self._columns.values():
+                    column[:n] = column[self._start:self._stop]
+                self._start, self._stop = 0, n
+        elif self._stop == size:
+            columns = self._allocate(size + self.chunk_size)
+            for name, column in self._columns.items():
+                columns[name][:size] = column
+            self._columns = columns
+
+    def _row(self, time_step):
+        """
+        find the row of a time step, the most recent rows are checked first
+        :param time_step: index for time step
+        :return: int row
+        """
+        time = self._columns['time']
+        for row in (self._stop - 1, self._stop - 2):
+            if row >= self._start and time[row] == time_step:
+                return row
+        row = self._start + np.searchsorted(time[self._start:self._stop], time_step)
+        if row < self._stop and time[row] == time_step:
+            return row
+        raise KeyError(time_step)
+
     def get_recent_state(self):
         """
         get the most recent price
         :return: time_step, price, position
         """
-        recent_time_step = self.recent_time
-        price = self.book[recent_time_step]['state']['price']
-        position = self.book[recent_time_step]['state']['position']
-        return recent_time_step, price, position
+        row = self._stop - 1
+        price = self._columns['price'][row].item()
+        position = self._columns['position'][row].item()
+        return self.recent_time, price, position
 
     def add_value(self, time_step, value):
         """
@@ -29,7 +111,7 @@ class Trade_book:
         :param time_step: index for time step
         :param value: change in value of the portfolio
         """
-        self.book[time_step]['value'] = value
+        self._columns['value'][self._row(time_step)] = value
 
     def add_state(self, time_step, price, position):
         """
@@ -38,7 +120,16 @@ class Trade_book:
         :param price: float price for each share
         :param position: int position for the share
         """
-        self.book[time_step]={'state':{'price':price, 'position':position}}
+        if len(self) and time_step == self.recent_time:
+            row = self._stop - 1
+        else:
+            self._make_room()
+            row = self._stop
+            self._stop += 1
+        for name, column in self._columns.items():
+            column[row] = np.nan if name != 'time' else time_step
+        self._columns['price'][row] = price
+        self._columns['position'][row] = position
         self.recent_time = time_step
 
     def add_action(self, time_step, action):
@@ -47,7 +138,7 @@ class Trade_book:
         :param time_step: index for time step
         :param action: int, change in the position
         """
-        self.book[time_step]['action'] = action
+        self._columns['action'][self._row(time_step)] = action
 
     def add_utility(self, time_step, utility):
         """
@@ -55,10 +146,47 @@ class Trade_book:
         :param time_step: index for time step
         :param utility: float utility
         """
-        self.book[time_step]['utility'] = utility
+        self._columns['utility'][self._row(time_step)] = utility
+
+    def to_arrays(self):
+        """
+        views of the recorded rows, no data is copied,
+        the views are only valid until the next row is added
+        :return: dict of column name: array
+        """
+        return {name: column[self._start:self._stop] for name, column in self._columns.items()}
+
+    def to_frame(self):
+        """
+        the recorded rows as a data frame indexed by time
+        :return: DataFrame with columns price, position, action, value, utility
+        """
+        import pandas as pd
+        arrays = self.to_arrays()
+        index = pd.Index(arrays.pop('time'), name='time')
+        return pd.DataFrame(arrays, index=index, copy=False)
+
+    @property
+    def book(self):
+        """
+        the records in the dictionary layout
+        time_step:{'state':{'price':float, 'position':float}, 'action':int, 'value':float, 'utility':float}
+        this builds a new dictionary on every access
+        """
+        arrays = self.to_arrays()
+        book = {}
+        for i, time_step in enumerate(arrays['time'].tolist()):
+            record = {'state': {'price': arrays['price'][i].item(), 'position': arrays['position'][i].item()}}
+            for name in ('action', 'value', 'utility'):
+                if not np.isnan(arrays[name][i]):
+                    record[name] = arrays[name][i].item()
+            book[time_step] = record
+        return book
 
     def clear(self):
         """
         clear the trade book, set it to None
         """
-        self.book.clear()
+        self._start = 0
+        self._stop = 0
+        self.recent_time = None
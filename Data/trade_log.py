@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from Simulation.replay_process import Replay_process
+from .trade_book import Trade_book
+
+
+class Trade_log:
+    """
+    append-only columnar trade log on disk, one raw binary file per Trade_book column,
+    readers map the files into memory so a history costs disk, not heap
+    the time column is expected to increase so that time ranges can be looked up
+    """
+    dtypes = {'time': np.int64, 'price': np.float64, 'position': np.float64,
+              'action': np.float64, 'value': np.float64, 'utility': np.float64}
+
+    def __init__(self, path, start=None, stop=None):
+        """
+        initialize an instance of trade log, the directory is created if it does not exist
+        :param path: str, directory of the log
+        :param start: [None], first time step to read, None for the beginning
+        :param stop: [None], time step to stop reading before, None for the end
+        """
+        self.path = path
+        self.start = start
+        self.stop = stop
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, name + '.bin')
+
+    def _length(self):
+        """
+        number of complete rows on disk, a partly written row at the end is ignored
+        """
+        lengths = []
+        for name, dtype in self.dtypes.items():
+            size = os.path.getsize(self._file(name)) if os.path.exists(self._file(name)) else 0
+            lengths.append(size // np.dtype(dtype).itemsize)
+        return min(lengths)
+
+    def _last_time(self):
+        """
+        time of the last complete row on disk, None if the log is empty
+        """
+        n = self._length()
+        if n == 0:
+            return None
+        return int(np.memmap(self._file('time'), dtype=self.dtypes['time'], mode='r', shape=(n,))[-1])
+
+    def __len__(self):
+        return len(self.to_arrays()['time'])
+
+    def append(self, trade_book, complete=True):
+        """
+        append the rows of a trade book to the log
+        :param trade_book: Trade_book
+        :param complete: [True], if True leave out the most recent row, whose action and value are not known yet
+        :raise ValueError: if the times of the rows do not increase past the last logged time
+        """
+        columns = trade_book.to_arrays()
+        n = len(columns['time']) - 1 if complete else len(columns['time'])
+        if n <= 0:
+            return
+        time = np.asarray(columns['time'][:n], dtype=self.dtypes['time'])
+        last = self._last_time()
+        if np.any(np.diff(time) <= 0) or (last is not None and time[0] <= last):
+            raise ValueError('trade log times must increase, the log ends at {} and the rows run from {} to {}'
+                             .format(last, time[0], time[-1]))
+        for name, dtype in self.dtypes.items():
+            with open(self._file(name), 'ab') as f:
+                f.write(np.ascontiguousarray(columns[name][:n], dtype=dtype).tobytes())
+
+    def between(self, start=None, stop=None):
+        """
+        the same log restricted to a time range
+        :param start: [None], first time step, None for the beginning
+        :param stop: [None], time step to stop before, None for the end
+        :return: Trade_log
+        """
+        return Trade_log(self.path, start, stop)
+
+    def to_arrays(self):
+        """
+        read only memory maps of the rows in the time range, no data is copied
+        :return: dict of column name: array
+        """
+        n = self._length()
+        if n == 0:
+            return {name: np.zeros(0, dtype=dtype) for name, dtype in self.dtypes.items()}
+        columns = {name: np.memmap(self._file(name), dtype=dtype, mode='r', shape=(n,))
+                   for name, dtype in self.dtypes.items()}
+        first = 0 if self.start is None else np.searchsorted(columns['time'], self.start)
+        last = n if self.stop is None else np.searchsorted(columns['time'], self.stop)
+        return {name: column[first:last] for name, column in columns.items()}
+
+    def to_frame(self):
+        """
+        the rows in the time range as a data frame indexed by time
+        :return: DataFrame with columns price, position, action, value, utility
+        """
+        import pandas as pd
+        arrays = self.to_arrays()
+        index = pd.Index(arrays.pop('time'), name='time')
+        return pd.DataFrame(arrays, index=index, copy=False)
+
+    def to_trade_book(self):
+        """
+        copy the rows in the time range into memory
+        :return: Trade_book
+        """
+        return Trade_book.from_arrays(**self.to_arrays())
+
+    def price_process(self):
+        """
+        a price process that replays the logged prices of the time range
+        :return: Replay_process
+        """
+        columns = self.to_arrays()
+        return Replay_process(columns['time'], columns['price'])
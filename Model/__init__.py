@@ -2,5 +2,11 @@ from .sla import SLA
 from .strategy import Strategy
 from .rwm import RWM
 from .ftpl import FTPL
+from .cache import Prediction_cache
+from .q_table import Q_table
+from .serialization import save_model, load_model
+from .budget import Training_budget
+from .tile_coding import Tile_coding
 
-__all__ = ['SLA', 'Strategy', 'RWM', 'FTPL']
+__all__ = ['SLA', 'Strategy', 'RWM', 'FTPL', 'Prediction_cache', 'Q_table', 'save_model', 'load_model',
+           'Training_budget', 'Tile_coding']
@@ -0,0 +1,55 @@
+"""
+supervised learner backends of the SLA, RWM and FTPL ensembles,
+each backend returns a new unfitted estimator with fit and predict, sklearn is imported on first use,
+Training_budget lists the limits each backend honors
+"""
+
+
+def gbr():
+    """
+    gradient boosted trees, the original base learner: accurate, slow to fit and to predict
+    """
+    from sklearn.ensemble import GradientBoostingRegressor
+    return GradientBoostingRegressor(n_estimators=500, max_depth=6, learning_rate=0.01, loss='squared_error',
+                                     min_samples_split=2)
+
+
+def hist_gbr():
+    """
+    histogram gradient boosting, bins the features once and fits much faster on large batches
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    return HistGradientBoostingRegressor(max_iter=200, max_depth=6, learning_rate=0.05, early_stopping=False)
+
+
+def tree():
+    """
+    a single regression tree, the cheapest non linear learner
+    """
+    from sklearn.tree import DecisionTreeRegressor
+    return DecisionTreeRegressor(max_depth=8, min_samples_leaf=20)
+
+
+def linear():
+    """
+    ridge regression on quadratic features of [state, action]
+    """
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+    from sklearn.linear_model import Ridge
+    return make_pipeline(PolynomialFeatures(2), StandardScaler(), Ridge(alpha=1.))
+
+
+backends = {'gbr': gbr, 'hist_gbr': hist_gbr, 'tree': tree, 'linear': linear}
+
+
+def make_estimator(backend='gbr'):
+    """
+    :param backend: str, name of a registered backend, or a callable that returns an unfitted estimator
+    :return: unfitted estimator
+    """
+    if callable(backend):
+        return backend()
+    if backend not in backends:
+        raise ValueError('unknown backend: {}, choose from {}'.format(backend, sorted(backends)))
+    return backends[backend]()
@@ -0,0 +1,104 @@
+import time
+import inspect
+import warnings
+import numpy as np
+
+
+class Training_budget:
+    """
+    limits on the fit of one supervised learner: wall clock seconds, number of rows,
+    and early stopping on a held out validation split
+
+    the backends honor the limits as follows:
+        gbr, GradientBoostingRegressor: max_rows, max_seconds and early stopping on the validation rows
+        hist_gbr, HistGradientBoostingRegressor: max_rows and early stopping on the validation rows,
+                  max_seconds is not honored, there is no callback between its rounds
+        tree, linear and other estimators: max_rows, the validation rows are only scored
+    a warning is issued when max_seconds is set for an estimator that does not honor it
+    """
+
+    def __init__(self, max_seconds=None, max_rows=None, validation=None, patience=20, seed=0):
+        """
+        initialize an instance of training budget
+        :param max_seconds: [None], float, stop adding boosting rounds after this many seconds,
+                            GradientBoostingRegressor only
+        :param max_rows: [None], int, train on a random subsample of at most this many rows
+        :param validation: [None], float fraction of the rows held out to score the learner and stop early,
+                           the last rows of the batch are held out since they are ordered in time
+        :param patience: int, boosting rounds without improvement of the validation loss before stopping
+        :param seed: int, seed of the subsample
+        """
+        self.max_seconds = max_seconds
+        self.max_rows = max_rows
+        self.validation = validation
+        self.patience = patience
+        self.seed = seed
+
+    def split(self, X, y):
+        """
+        subsample the batch and hold out the validation rows
+        :param X: training features [state, action]
+        :param y: training labels [value of state-action function]
+        :return: X_train, y_train, X_val, y_val, validation arrays are None without a validation split
+        """
+        X, y = np.asarray(X), np.asarray(y)
+        if self.max_rows is not None and len(X) > self.max_rows:
+            rows = np.sort(np.random.default_rng(self.seed).choice(len(X), self.max_rows, replace=False))
+            X, y = X[rows], y[rows]
+        if not self.validation:
+            return X, y, None, None
+        n_train = len(X) - max(1, int(len(X) * self.validation))
+        return X[:n_train], y[:n_train], X[n_train:], y[n_train:]
+
+    def monitor(self, X_val, y_val):
+        """
+        callback of GradientBoostingRegressor.fit, called after every boosting round,
+        it stops the fit when the time is up or the validation loss stopped improving
+        :param X_val: validation features or None
+        :param y_val: validation labels or None
+        :return: callable (i, estimator, locals) -> True to stop
+        """
+        start = time.perf_counter()
+        state = {'prediction': None, 'best': np.inf, 'best_round': 0}
+
+        def monitor(i, sl, local_variables):
+            if self.max_seconds is not None and time.perf_counter() - start > self.max_seconds:
+                return True
+            if X_val is None:
+                return False
+            # the validation prediction is carried forward one tree at a time
+            if state['prediction'] is None:
+                state['prediction'] = sl.init_.predict(X_val).astype(float).reshape(-1)
+            state['prediction'] += sl.learning_rate * sl.estimators_[i, 0].predict(X_val)
+            loss = np.mean((y_val - state['prediction']) ** 2)
+            if loss < state['best']:
+                state['best'], state['best_round'] = loss, i
+            return i - state['best_round'] >= self.patience
+
+        return monitor
+
+    def fit(self, sl, X, y):
+        """
+        fit a supervised learner within the budget
+        :param sl: unfitted estimator
+        :param X: training features [state, action]
+        :param y: training labels [value of state-action function]
+        :return: float, validation score, or the training score without a validation split
+        """
+        X_train, y_train, X_val, y_val = self.split(X, y)
+        if type(sl).__name__ == 'GradientBoostingRegressor':
+            sl.fit(X_train, y_train, monitor=self.monitor(X_val, y_val))
+        else:
+            if self.max_seconds is not None:
+                warnings.warn('max_seconds is not honored by {}, only GradientBoostingRegressor stops on time'
+                              .format(type(sl).__name__))
+            # early stopping scores the time ordered validation rows, not a random split of the training rows
+            if X_val is not None and 'early_stopping' in sl.get_params() \
+                    and 'X_val' in inspect.signature(sl.fit).parameters:
+                sl.set_params(early_stopping=True, n_iter_no_change=self.patience)
+                sl.fit(X_train, y_train, X_val=X_val, y_val=y_val)
+            else:
+                sl.fit(X_train, y_train)
+        if X_val is None:
+            return sl.score(X_train, y_train)
+        return sl.score(X_val, y_val)
@@ -0,0 +1,71 @@
+import numpy as np
+from collections import OrderedDict
+from .utils import predict_matrix
+
+
+class Prediction_cache:
+    """
+    least recently used cache of raw supervised learner outputs,
+    keyed on the discretized [state, action] row,
+    one cache belongs to one ensemble of learners
+    """
+
+    def __init__(self, maxsize=100000, decimals=1):
+        """
+        initialize an instance of prediction cache
+        :param maxsize: int, max number of state-action rows to keep
+        :param decimals: int, number of decimals kept in the key, prices move on a 0.1 grid
+        """
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.store)
+
+    def predict(self, learners, X):
+        """
+        evaluate every supervised learner on all rows of X, only the rows not in the cache are predicted
+        :param learners: iterable of fitted supervised learners
+        :param X: 2d array of features [state, action]
+        :return: array (number of learners, number of rows)
+        """
+        X = np.asarray(X, dtype=float).reshape((len(X), -1))
+        keys = [tuple(row) for row in np.round(X, self.decimals).tolist()]
+        q_values = np.empty((len(learners), len(X)))
+        missing = []
+        for i, key in enumerate(keys):
+            value = self.store.get(key)
+            if value is None:
+                missing.append(i)
+            else:
+                self.store.move_to_end(key)
+                q_values[:, i] = value
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            values = predict_matrix(learners, X[missing])
+            q_values[:, missing] = values
+            for j, i in enumerate(missing):
+                self.store[keys[i]] = values[:, j]
+            while len(self.store) > self.maxsize:
+                self.store.popitem(last=False)
+        return q_values
+
+    def clear(self):
+        """
+        drop all the cached values, the hit and miss counters are kept
+        """
+        self.store.clear()
+
+    def info(self):
+        """
+        report the cache usage
+        :return: dict with hits, misses, hit rate, size and maxsize
+        """
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit rate': self.hits / total if total else 0.,
+                'size': len(self.store), 'maxsize': self.maxsize}
@@ -1,9 +1,9 @@
-from sklearn.base import clone
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn import ensemble
 import numpy as np
 from collections import deque
+from .utils import predict_matrix, state_action_matrix, train_learner, eviction_index, check_eviction
+from .utils import state_action_batch, masked_argmax, random_allowed
+from Profiling import recorder
+from Simulation.random_source import global_source
 
 
 class FTPL:
@@ -11,15 +11,29 @@ class FTPL:
     follow the perturbed leader
     """
 
-    def __init__(self, eps = 0.05, limit = 20):
+    def __init__(self, eps = 0.05, limit = 20, cache=None, capacity=15, eviction=None, backend='gbr',
+                 budget=None, rng=None):
         """
         initialize an instance of randomized weighted majority learner
+        :param cache: [None], Prediction_cache for the outputs of the supervised learners
+        :param capacity: int, maximum number of supervised learners
+        :param eviction: [None], None to stop training at capacity,
+                         'oldest' or 'penalty' to evict the oldest learner or the one with the highest penalty
+        :param backend: ['gbr'], supervised learner backend, a name in Model.backends or a callable
+        :param budget: [None], Training_budget that limits the fit of each supervised learner
+        :param rng: [None], Random_source of the learner's draws, if None the global np.random state
         """
         self.supervised_learners = deque()
         self.weight = None
         self.probability = None
         self.previous_guess = None
         self.eps = eps
+        self.cache = cache
+        self.capacity = capacity
+        self.backend = backend
+        self.budget = budget
+        self.rng = rng if rng is not None else global_source
+        self.eviction = check_eviction(eviction, ('oldest', 'penalty'))
 
     def adjust_weight(self, utility_array):
         """
@@ -47,10 +61,13 @@ class FTPL:
             return 0.
 
         x = np.r_[state, one_action].reshape((1,-1))
-        perturbed_w = self.weight + np.random.uniform(0, 1/self.eps, len(self.weight))
+        perturbed_w = self.weight + self.rng.uniforms(len(self.weight), 0, 1 / self.eps)
         #learner_id = np.argmin(perturbed_w)
         # todo: test if use top 25% is an good idea
         learner_id = np.argsort(perturbed_w)
+        if self.cache is not None:
+            q_values = predict_matrix(self.supervised_learners, x, self.cache)
+            return q_values[learner_id[:int(np.ceil(0.5 * len(learner_id)))]].mean(axis=0)
         q_value = 0
         for i in range(int(np.ceil(0.5 * len(learner_id)))):
             q_value += self.supervised_learners[learner_id[i]].predict(x)
@@ -58,6 +75,24 @@ class FTPL:
 
         #return self.supervised_learners[learner_id].predict(x)
 
+    @recorder.timed('ftpl.qval_batch')
+    def qval_batch(self, X):
+        """
+        compute q values for many state-action rows at once,
+        each row draws its own perturbation and averages its own leading half of the learners
+        :param X: 2d array, each row is [state, action]
+        :return array of values for state-action function
+        """
+        if not self.supervised_learners:
+            return np.zeros(len(X))
+        n_learners = len(self.supervised_learners)
+        perturbed_w = self.weight + self.rng.uniforms((len(X), n_learners), 0, 1 / self.eps)
+        n_leaders = int(np.ceil(0.5 * n_learners))
+        learner_id = np.argsort(perturbed_w, axis=1)[:, :n_leaders]
+        q_values = predict_matrix(self.supervised_learners, X, self.cache).T
+        return np.take_along_axis(q_values, learner_id, axis=1).sum(axis=1) / n_leaders
+
+    @recorder.timed('ftpl.predict')
     def predict(self, state, possible_actions):
         """
         give action based on current state
@@ -66,24 +101,17 @@ class FTPL:
         :return the action to maximize the state-action function
         """
         if not self.supervised_learners:
-            return np.random.choice(possible_actions)
-        self.previous_guess = np.zeros(len(self.supervised_learners))
-        for i in range(len(self.supervised_learners)):
-            state_action_values = np.zeros(len(possible_actions))
-            for j in range(len(possible_actions)):
-                x = np.r_[state, possible_actions[j]].reshape((1,-1))
-                state_action_values[j] = self.supervised_learners[i].predict(x)
-            self.previous_guess[i] = possible_actions[np.argmax(state_action_values)]
-        perturbed_w = self.weight + np.random.uniform(0, 1 / self.eps, len(self.weight))
+            return possible_actions[self.rng.integers(len(possible_actions))]
+        # every learner scores all the actions in one call
+        state_action_values = predict_matrix(self.supervised_learners, state_action_matrix(state, possible_actions),
+                                             self.cache)
+        self.previous_guess = np.asarray(possible_actions, dtype=float)[np.argmax(state_action_values, axis=1)]
+        perturbed_w = self.weight + self.rng.uniforms(len(self.weight), 0, 1 / self.eps)
         learner_id = np.argsort(perturbed_w)
         # todo: possible modification
         # todo: average the top 25%'s q function
 
-        q_value_array = np.zeros(len(possible_actions))
-        for i in range(len(possible_actions)):
-            x = np.r_[state, possible_actions[i]].reshape((1, -1))
-            for j in range(int(np.ceil(0.5 * len(learner_id)))):
-                q_value_array[i] += self.supervised_learners[learner_id[j]].predict(x)
+        q_value_array = state_action_values[learner_id[:int(np.ceil(0.5 * len(learner_id)))]].sum(axis=0)
         return possible_actions[np.argmax(q_value_array)]
         """
         action = 0
@@ -92,7 +120,76 @@ class FTPL:
         return action /  int(np.ceil(0.25 * len(learner_id)))
         """
 
+    def predict_batch(self, states, possible_actions, mask=None):
+        """
+        give actions for many states at once,
+        each state draws its own perturbation, the penalties and previous guesses are not changed
+        :param states: 2d array, one state per row
+        :param possible_actions: a list of possible actions
+        :param mask: [None], bool array (number of states, number of actions), False for actions not allowed
+        :return: array of the action for each state
+        """
+        possible_actions = np.asarray(possible_actions)
+        if mask is None:
+            mask = np.ones((len(states), len(possible_actions)), dtype=bool)
+        if not self.supervised_learners:
+            return possible_actions[random_allowed(mask, self.rng)]
+        X = state_action_batch(states, possible_actions)
+        values = predict_matrix(self.supervised_learners, X, self.cache)
+        values = values.reshape((-1, len(states), len(possible_actions)))
+        perturbed_w = self.weight + self.rng.uniforms((len(states), len(self.weight)), 0, 1 / self.eps)
+        leaders = np.argsort(perturbed_w, axis=1)[:, :int(np.ceil(0.5 * len(self.weight)))]
+        q_value_array = values[leaders.T, np.arange(len(states))].sum(axis=0)
+        return possible_actions[masked_argmax(q_value_array, mask)]
+
+    def ensemble_weight(self):
+        """
+        weight of each supervised learner in the state-action function without perturbation,
+        the leading half with the smallest penalty share the weight equally
+        :return: array of weights that sum to one
+        """
+        weight = np.zeros(len(self.supervised_learners))
+        if self.supervised_learners:
+            n_leaders = int(np.ceil(0.5 * len(weight)))
+            weight[np.argsort(self.weight)[:n_leaders]] = 1. / n_leaders
+        return weight
 
+    def is_full(self):
+        """
+        check if the ensemble takes no more supervised learners,
+        an ensemble with an eviction policy is never full
+        :return: True if full
+        """
+        return self.eviction is None and len(self.supervised_learners) >= self.capacity
+
+    def evict(self, i):
+        """
+        remove a supervised learner from the ensemble together with its penalty
+        :param i: int, index of the learner
+        """
+        del self.supervised_learners[i]
+        if self.cache is not None:
+            self.cache.clear()
+        # guesses of the last decision no longer line up with the learners
+        self.previous_guess = None
+        self.weight = np.delete(self.weight, i) if self.supervised_learners else None
+        self.active_weight = self.weight
+
+    def add_learner(self, sl):
+        """
+        add a fitted supervised learner to the ensemble, all penalties are reset,
+        at capacity a learner is evicted first
+        :param sl: fitted supervised learner
+        """
+        if self.eviction is not None and len(self.supervised_learners) >= self.capacity:
+            self.evict(eviction_index(self.eviction, self.weight))
+        self.supervised_learners.append(sl)
+        if self.cache is not None:
+            self.cache.clear()
+        self.weight = np.ones(len(self.supervised_learners))
+        self.active_weight = self.weight
+
+    @recorder.timed('ftpl.fit')
     def fit(self, X, y):
         """
         fit the next batch of training data with a new supervised_learner
@@ -100,15 +197,9 @@ class FTPL:
         :param y: training labels [value of state-action function]
         """
 
-        if len(self.supervised_learners)>=15:
+        if self.is_full():
             print('enough ftpl learners, stop training')
             self.weight = np.ones(len(self.supervised_learners))
             self.probability = self.weight / (sum(self.weight))
         else:
-
-            sl = ensemble.GradientBoostingRegressor(n_estimators=500, max_depth=6,
-                                                learning_rate = 0.01, loss='ls', min_samples_split=2)
-            self.supervised_learners.append(sl.fit(X, y))
-            self.weight = np.ones(len(self.supervised_learners))
-            self.active_weight = self.weight
-            print('accuracy is : ',sl.score(X,y))
+            self.add_learner(train_learner(X, y, self.backend, self.budget))
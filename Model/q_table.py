@@ -0,0 +1,171 @@
+import numpy as np
+from .utils import predict_matrix, masked_argmax
+
+
+class Q_table:
+    """
+    dense state-action function over a price grid x position grid x action set,
+    compiled from a trained learner so that a frozen policy becomes a table lookup
+    """
+
+    def __init__(self, values, prices, positions, actions):
+        """
+        initialize an instance of Q table
+        :param values: array (number of prices, number of positions, number of actions)
+        :param prices: increasing array of grid prices
+        :param positions: increasing array of grid positions
+        :param actions: array of actions
+        """
+        self.values = values
+        self.prices = np.asarray(prices, dtype=float)
+        self.positions = np.asarray(positions, dtype=float)
+        self.actions = np.asarray(actions, dtype=float)
+
+    @classmethod
+    def compile(cls, learner, prices=None, positions=None, actions=(-200, -100, 0, 100, 200),
+                price_range=(0, 100), tick=0.1, threshold=(-1000, 1000)):
+        """
+        evaluate the expected state-action function of a learner on the whole grid,
+        every supervised learner predicts the grid in one call,
+        a learner without supervised learners, e.g. Tile_coding, scores the grid with its qval_batch
+        :param learner: SLA, RWM, FTPL or Tile_coding learner
+        :param prices: [None], grid prices, if None every tick inside price_range
+        :param positions: [None], grid positions, if None every multiple of the smallest action move inside threshold
+        :param actions: list of possible actions
+        :param price_range: min and max price of the default price grid
+        :param tick: float, price tick of the default price grid
+        :param threshold: position threshold of the default position grid
+        :return: Q_table
+        """
+        actions = np.asarray(actions, dtype=float)
+        if prices is None:
+            prices = np.round(np.arange(price_range[0], price_range[1] + tick / 2, tick), 1)
+        if positions is None:
+            lot = np.gcd.reduce(np.abs(actions).astype(int))
+            positions = np.arange(threshold[0], threshold[1] + lot / 2, lot)
+        prices = np.sort(np.asarray(prices, dtype=float))
+        positions = np.sort(np.asarray(positions, dtype=float))
+
+        grid = np.meshgrid(prices, positions, actions, indexing='ij')
+        X = np.column_stack([axis.ravel() for axis in grid])
+        if not hasattr(learner, 'supervised_learners'):
+            q_values = learner.qval_batch(X)
+        elif learner.supervised_learners:
+            q_values = learner.ensemble_weight() @ predict_matrix(learner.supervised_learners, X)
+        else:
+            q_values = np.zeros(len(X))
+        return cls(q_values.reshape((len(prices), len(positions), len(actions))), prices, positions, actions)
+
+    @staticmethod
+    def _nearest(grid, x):
+        """
+        index of the nearest grid point
+        :param grid: increasing array
+        :param x: float or array
+        :return: int or int array
+        """
+        return np.searchsorted((grid[1:] + grid[:-1]) / 2, x)
+
+    def price_index(self, price):
+        """
+        :param price: float or array of prices
+        :return: index of the nearest grid price
+        """
+        return self._nearest(self.prices, price)
+
+    def position_index(self, position):
+        """
+        :param position: float or array of positions
+        :return: index of the nearest grid position
+        """
+        return self._nearest(self.positions, position)
+
+    def action_index(self, action):
+        """
+        :param action: float or array of actions in the action set
+        :return: index of the action
+        """
+        return np.argmax(np.equal.outer(action, self.actions), axis=-1)
+
+    def restrict(self, actions):
+        """
+        the table for a subset of the actions
+        :param actions: list of actions, all of them in the action set
+        :return: Q_table
+        """
+        actions = np.asarray(actions, dtype=float)
+        if not np.isin(actions, self.actions).all():
+            raise ValueError('actions {} are not all in the action set {}'.format(actions, self.actions))
+        index = self.action_index(actions)
+        return Q_table(self.values[..., index], self.prices, self.positions, self.actions[index])
+
+    def qval_batch(self, X):
+        """
+        look up the q values for many state-action rows
+        :param X: 2d array, each row is [price, position, action]
+        :return array of values for state-action function
+        """
+        X = np.asarray(X, dtype=float)
+        return self.values[self.price_index(X[:, 0]), self.position_index(X[:, 1]), self.action_index(X[:, 2])]
+
+    def qval(self, state, action):
+        """
+        look up the q value for state, action
+        :param state: [price, position]
+        :param action: int action
+        :return the value for state-action function
+        """
+        return self.qval_batch(np.r_[state, action].reshape((1, -1)))[0]
+
+    def predict(self, state, possible_actions):
+        """
+        give action based on current state
+        :param state: [price, position]
+        :param possible_actions: a list of possible actions
+        :return the action to maximize the state-action function
+        """
+        q_values = self.values[self.price_index(state[0]), self.position_index(state[1])]
+        return possible_actions[np.argmax(q_values[self.action_index(possible_actions)])]
+
+    def predict_batch(self, states, possible_actions, mask=None):
+        """
+        give actions for many states at once, as predict does for one state
+        :param states: 2d array, one [price, position] per row
+        :param possible_actions: a list of possible actions
+        :param mask: [None], bool array (number of states, number of actions), False for actions not allowed
+        :return: array of the action for each state
+        """
+        states = np.asarray(states, dtype=float)
+        q_values = self.values[self.price_index(states[:, 0]), self.position_index(states[:, 1])]
+        values = q_values[:, self.action_index(possible_actions)]
+        return np.asarray(possible_actions)[masked_argmax(values, mask)]
+
+    def surface(self, position, prices=None):
+        """
+        q values of every action along the price grid for one position
+        :param position: float position
+        :param prices: [None], prices to look up, if None the grid prices
+        :return: array (number of prices, number of actions)
+        """
+        price_index = slice(None) if prices is None else self.price_index(prices)
+        return self.values[price_index, self.position_index(position)]
+
+    def policy(self, threshold=None, positions=None):
+        """
+        greedy action for every grid price and position, actions that break the position threshold are not taken
+        :param threshold: [None], position threshold, if None every action is allowed
+        :param positions: [None], positions to give actions for, each looked up at the nearest grid position
+                          while the threshold applies to the position itself, if None the grid positions
+        :return: array (number of prices, number of positions) of actions
+        """
+        if positions is None:
+            positions = self.positions
+            q_values = self.values.copy()
+        else:
+            positions = np.asarray(positions, dtype=float)
+            q_values = self.values[:, self.position_index(positions)]
+        if threshold is not None:
+            next_position = positions[:, None] + self.actions[None, :]
+            allowed = (threshold[0] <= next_position) & (next_position <= threshold[1])
+            q_values[:, ~allowed] = -np.inf
+        return self.actions[np.argmax(q_values, axis=2)]
@@ -1,9 +1,9 @@
-from sklearn.base import clone
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn import ensemble
 import numpy as np
 from collections import deque
+from .utils import predict_matrix, state_action_matrix, train_learner, eviction_index, check_eviction
+from .utils import state_action_batch, masked_argmax, random_allowed
+from Profiling import recorder
+from Simulation.random_source import global_source
 
 
 class RWM:
@@ -11,16 +11,30 @@ class RWM:
     randomized weighted majority
     """
 
-    def __init__(self, beta = .995):
+    def __init__(self, beta = .995, cache=None, capacity=15, eviction=None, backend='gbr',
+                 budget=None, rng=None):
         """
         initialize an instance of randomized weighted majority learner
         :param beta: [0.8], penalty for wrong guess
+        :param cache: [None], Prediction_cache for the outputs of the supervised learners
+        :param capacity: int, maximum number of supervised learners
+        :param eviction: [None], None to stop training at capacity,
+                         'oldest' or 'weight' to evict the oldest learner or the one with the lowest weight
+        :param backend: ['gbr'], supervised learner backend, a name in Model.backends or a callable
+        :param budget: [None], Training_budget that limits the fit of each supervised learner
+        :param rng: [None], Random_source of the learner's draws, if None the global np.random state
         """
         self.supervised_learners = deque()
         self.weight = None
         self.probability = None
         self.previous_guess = None
         self.beta = beta
+        self.cache = cache
+        self.capacity = capacity
+        self.backend = backend
+        self.budget = budget
+        self.rng = rng if rng is not None else global_source
+        self.eviction = check_eviction(eviction, ('oldest', 'weight'))
 
     def adjust_weight(self, utility_array):
         """
@@ -54,10 +68,32 @@ class RWM:
             return 0.
 
         x = np.r_[state, one_action].reshape((1,-1))
-        learner_number = np.arange(len(self.supervised_learners))
-        learner_id = np.random.choice(learner_number, p=self.probability)
+        learner_id = self.rng.choice(len(self.supervised_learners), self.probability)
+        if self.cache is not None:
+            return predict_matrix(self.supervised_learners, x, self.cache)[learner_id]
         return self.supervised_learners[learner_id].predict(x)
 
+    @recorder.timed('rwm.qval_batch')
+    def qval_batch(self, X):
+        """
+        compute q values for many state-action rows at once,
+        each row picks its own learner at random, every learner predicts its rows in one call
+        :param X: 2d array, each row is [state, action]
+        :return array of values for state-action function
+        """
+        X = np.asarray(X)
+        q_values = np.zeros(len(X))
+        if not self.supervised_learners:
+            return q_values
+        learner_id = self.rng.choices(len(self.supervised_learners), len(X), self.probability)
+        if self.cache is not None:
+            return predict_matrix(self.supervised_learners, X, self.cache)[learner_id, np.arange(len(X))]
+        for i in np.unique(learner_id):
+            rows = learner_id == i
+            q_values[rows] = self.supervised_learners[i].predict(X[rows])
+        return q_values
+
+    @recorder.timed('rwm.predict')
     def predict(self, state, possible_actions):
         """
         give action based on current state
@@ -66,18 +102,84 @@ class RWM:
         :return the action to maximize the state-action function
         """
         if not self.supervised_learners:
-            return np.random.choice(possible_actions)
-        self.previous_guess = np.zeros(len(self.supervised_learners))
-        for i in range(len(self.supervised_learners)):
-            state_action_values = np.zeros(len(possible_actions))
-            for j in range(len(possible_actions)):
-                x = np.r_[state, possible_actions[j]].reshape((1,-1))
-                state_action_values[j] = self.supervised_learners[i].predict(x)
-            self.previous_guess[i] = possible_actions[np.argmax(state_action_values)]
-        learner_list = np.arange(len(self.supervised_learners))
-        learner_id = np.random.choice(learner_list, p = self.probability)
+            return possible_actions[self.rng.integers(len(possible_actions))]
+        # every learner scores all the actions in one call
+        state_action_values = predict_matrix(self.supervised_learners, state_action_matrix(state, possible_actions),
+                                             self.cache)
+        self.previous_guess = np.asarray(possible_actions, dtype=float)[np.argmax(state_action_values, axis=1)]
+        learner_id = self.rng.choice(len(self.supervised_learners), self.probability)
         return self.previous_guess[learner_id]
 
+    def predict_batch(self, states, possible_actions, mask=None):
+        """
+        give actions for many states at once,
+        each state draws its own learner, the weights and previous guesses are not changed
+        :param states: 2d array, one state per row
+        :param possible_actions: a list of possible actions
+        :param mask: [None], bool array (number of states, number of actions), False for actions not allowed
+        :return: array of the action for each state
+        """
+        possible_actions = np.asarray(possible_actions)
+        if mask is None:
+            mask = np.ones((len(states), len(possible_actions)), dtype=bool)
+        if not self.supervised_learners:
+            return possible_actions[random_allowed(mask, self.rng)]
+        X = state_action_batch(states, possible_actions)
+        values = predict_matrix(self.supervised_learners, X, self.cache)
+        values = values.reshape((-1, len(states), len(possible_actions)))
+        learner_id = self.rng.choices(len(self.supervised_learners), len(states), self.probability)
+        return possible_actions[masked_argmax(values[learner_id, np.arange(len(states))], mask)]
+
+    def ensemble_weight(self):
+        """
+        weight of each supervised learner in the expected state-action function,
+        which is the probability of picking the learner
+        :return: array of weights that sum to one
+        """
+        if not self.supervised_learners:
+            return np.zeros(0)
+        return np.asarray(self.probability, dtype=float)
+
+    def is_full(self):
+        """
+        check if the ensemble takes no more supervised learners,
+        an ensemble with an eviction policy is never full
+        :return: True if full
+        """
+        return self.eviction is None and len(self.supervised_learners) >= self.capacity
+
+    def evict(self, i):
+        """
+        remove a supervised learner from the ensemble together with its weight,
+        the probability of the other learners is renormalized
+        :param i: int, index of the learner
+        """
+        del self.supervised_learners[i]
+        if self.cache is not None:
+            self.cache.clear()
+        # guesses of the last decision no longer line up with the learners
+        self.previous_guess = None
+        if not self.supervised_learners:
+            self.weight = self.probability = None
+            return
+        self.weight = np.delete(self.weight, i)
+        self.probability = self.weight / sum(self.weight)
+
+    def add_learner(self, sl):
+        """
+        add a fitted supervised learner to the ensemble, all weights are reset,
+        at capacity a learner is evicted first
+        :param sl: fitted supervised learner
+        """
+        if self.eviction is not None and len(self.supervised_learners) >= self.capacity:
+            self.evict(eviction_index(self.eviction, self.weight))
+        self.supervised_learners.append(sl)
+        if self.cache is not None:
+            self.cache.clear()
+        self.weight = np.ones(len(self.supervised_learners))
+        self.probability = self.weight/(sum(self.weight))
+
+    @recorder.timed('rwm.fit')
     def fit(self, X, y):
         """
         fit the next batch of training data with a new supervised_learner
@@ -85,15 +187,9 @@ class RWM:
         :param y: training labels [value of state-action function]
         """
 
-        if len(self.supervised_learners)>=15:
+        if self.is_full():
             print('enough rwm learners, stop training')
             self.weight = np.ones(len(self.supervised_learners))
             self.probability = self.weight / (sum(self.weight))
         else:
-
-            sl = ensemble.GradientBoostingRegressor(n_estimators=500, max_depth=6,
-                                                learning_rate = 0.01, loss='ls', min_samples_split=2)
-            self.supervised_learners.append(sl.fit(X, y))
-            self.weight = np.ones(len(self.supervised_learners))
-            self.probability = self.weight/(sum(self.weight))
-            print('accuracy is : ',sl.score(X,y))
+            self.add_learner(train_learner(X, y, self.backend, self.budget))
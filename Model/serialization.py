@@ -0,0 +1,258 @@
+import os
+import json
+import pickle
+import numpy as np
+from collections import deque
+from .sla import SLA
+from .rwm import RWM
+from .ftpl import FTPL
+from .strategy import Strategy
+
+learner_types = {'SLA': SLA, 'RWM': RWM, 'FTPL': FTPL}
+# constructor parameters and weight arrays saved with each learner type
+learner_params = {'SLA': ('capacity', 'eviction', 'backend'), 'RWM': ('beta', 'capacity', 'eviction', 'backend'),
+                  'FTPL': ('eps', 'capacity', 'eviction', 'backend')}
+learner_arrays = ('weight', 'probability')
+node_arrays = ('children_left', 'children_right', 'feature', 'threshold', 'value')
+
+
+class Flat_trees:
+    """
+    prediction of a tree ensemble from flattened node arrays:
+    init + scale * sum of the leaf values of the trees
+    large batches walk one tree at a time over a complete binary layout of the trees,
+    small batches walk all trees together, both over chunks of rows so memory does not grow with the batch
+    """
+    # rows walked at a time by one tree
+    chunk_size = 16384
+    # (row, tree) pairs walked at a time when all trees are walked together
+    chunk_elements = 2 ** 16
+    # batches with fewer rows walk all trees together, a python loop over the trees would cost more
+    min_rows = 256
+    # deeper trees are not laid out as complete trees, the layout doubles with every level
+    max_layout_depth = 12
+
+    def __init__(self, nodes, roots, ends, scale, init, max_depth):
+        """
+        initialize an instance of flat trees
+        :param nodes: dict of node arrays shared by all the saved trees, child indices are global
+        :param roots: int array, global index of the root of each tree
+        :param ends: int array, global index after the last node of each tree
+        :param scale: float, factor on the sum of tree outputs
+        :param init: float, constant added to the prediction
+        :param max_depth: int, depth of the deepest tree
+        """
+        self.nodes = nodes
+        self.roots = roots
+        self.ends = ends
+        self.scale = scale
+        self.init = init
+        self.max_depth = max_depth
+        self._layout = None
+
+    def predict(self, X):
+        """
+        :param X: 2d array of features [state, action]
+        :return: array of predictions
+        """
+        # trees compare float32 features, as in sklearn
+        X = np.asarray(X, dtype=np.float32).reshape((len(X), -1))
+        if len(X) < self.min_rows or self.max_depth > self.max_layout_depth:
+            chunk, walk = max(self.chunk_elements // max(len(self.roots), 1), 1), self._walk_together
+        else:
+            chunk, walk = self.chunk_size, self._walk_each
+        total = np.empty(len(X))
+        for start in range(0, len(X), chunk):
+            total[start:start + chunk] = walk(X[start:start + chunk])
+        return self.init + self.scale * total
+
+    def _walk_together(self, X):
+        """
+        :param X: 2d float32 array of features
+        :return: array, sum of the leaf values of all trees, the trees are walked together on the node arrays
+        """
+        left, right = self.nodes['children_left'], self.nodes['children_right']
+        node = np.tile(self.roots, (len(X), 1))
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.max_depth):
+            child = left[node]
+            leaf = child == -1
+            if leaf.all():
+                break
+            go_left = X[rows, self.nodes['feature'][node]] <= self.nodes['threshold'][node]
+            node = np.where(leaf, node, np.where(go_left, child, right[node]))
+        return self.nodes['value'][node].sum(axis=1)
+
+    def _walk_each(self, X):
+        """
+        :param X: 2d float32 array of features
+        :return: array, sum of the leaf values of all trees, one tree at a time on the complete layout
+        """
+        feature, threshold, value = self._complete_layout()
+        X = X.astype(np.float64)
+        x = X.reshape(-1)
+        first = np.arange(len(X), dtype=np.intp) * X.shape[1]
+        index = np.empty(len(X), dtype=np.intp)
+        total = np.zeros(len(X))
+        for tree in range(len(self.roots)):
+            # heap position in the complete tree, the root is 1 and the children of i are 2i and 2i + 1,
+            # every row starts at the root, so the first level needs no gather
+            node = np.ones(len(X), dtype=np.intp)
+            if self.max_depth:
+                node += 1 + (X[:, feature[tree, 1]] > threshold[tree, 1])
+            for _ in range(self.max_depth - 1):
+                np.add(first, feature[tree].take(node), out=index)
+                go_right = x.take(index) > threshold[tree].take(node)
+                node *= 2
+                node += go_right
+            total += value[tree].take(node - 2 ** self.max_depth)
+        return total
+
+    def _complete_layout(self):
+        """
+        the trees padded to complete binary trees of max_depth, built on first use,
+        a leaf above the last level is copied to both of its children so every row walks max_depth levels
+        :return: feature and threshold, arrays (n_trees, 2 ** max_depth) of the heap positions 1 to 2 ** max_depth - 1,
+                 value, array (n_trees, 2 ** max_depth) of the last level
+        """
+        if self._layout is None:
+            left, right = self.nodes['children_left'], self.nodes['children_right']
+            node = np.asarray(self.roots, dtype=np.intp)[:, None]
+            features, thresholds = [np.zeros((len(node), 1), dtype=np.intp)], [np.zeros((len(node), 1))]
+            for _ in range(self.max_depth):
+                leaf = left[node] == -1
+                features.append(np.where(leaf, 0, self.nodes['feature'][node]))
+                thresholds.append(np.where(leaf, np.inf, self.nodes['threshold'][node]))
+                node = np.stack([np.where(leaf, node, left[node]), np.where(leaf, node, right[node])], axis=2)
+                node = node.reshape((len(node), -1))
+            self._layout = (np.concatenate(features, axis=1).astype(np.intp), np.concatenate(thresholds, axis=1),
+                            np.asarray(self.nodes['value'][node], dtype=np.float64))
+        return self._layout
+
+
+def _flatten(sl):
+    """
+    the trees of a supported estimator as node arrays with local child indices
+    :param sl: fitted supervised learner
+    :return: list of dict of node arrays, scale, init, max_depth; None if the estimator is not supported
+    """
+    name = type(sl).__name__
+    if name == 'Flat_trees':
+        trees = []
+        for root, end in zip(sl.roots, sl.ends):
+            tree = {key: np.asarray(sl.nodes[key][root:end]) for key in node_arrays}
+            for key in ('children_left', 'children_right'):
+                tree[key] = np.where(tree[key] == -1, -1, tree[key] - root)
+            trees.append(tree)
+        return trees, sl.scale, sl.init, sl.max_depth
+
+    if name == 'GradientBoostingRegressor':
+        estimators = list(sl.estimators_[:, 0])
+        x0 = np.zeros((1, sl.n_features_in_))
+        scale = sl.learning_rate
+        init = sl.predict(x0)[0] - scale * sum(est.predict(x0)[0] for est in estimators)
+    elif name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        estimators = list(sl.estimators_)
+        scale, init = 1. / len(estimators), 0.
+    elif name in ('DecisionTreeRegressor', 'ExtraTreeRegressor'):
+        estimators = [sl]
+        scale, init = 1., 0.
+    else:
+        return None
+    trees = [{'children_left': est.tree_.children_left, 'children_right': est.tree_.children_right,
+              'feature': est.tree_.feature, 'threshold': est.tree_.threshold,
+              'value': est.tree_.value.reshape(-1)} for est in estimators]
+    return trees, scale, init, max(est.tree_.max_depth for est in estimators)
+
+
+def save_model(model, path):
+    """
+    save a Strategy or an SLA, RWM or FTPL learner to a directory,
+    the trees of all supervised learners are flattened into shared numpy arrays,
+    other supervised learners are pickled
+    :param model: Strategy or learner
+    :param path: str, directory, created if it does not exist
+    """
+    os.makedirs(path, exist_ok=True)
+    learner = model.learner if isinstance(model, Strategy) else model
+    kind = type(learner).__name__
+    if kind not in learner_types:
+        raise TypeError('cannot save learner of type {}'.format(kind))
+
+    meta = {'strategy': isinstance(model, Strategy), 'learner': kind,
+            'params': {name: getattr(learner, name) for name in learner_params[kind]},
+            'supervised_learners': []}
+    # a backend given as a callable is not saved, the loaded learner trains with the default backend
+    if callable(meta['params'].get('backend')):
+        del meta['params']['backend']
+    nodes = {name: [] for name in node_arrays}
+    roots = []
+    offset = 0
+    for i, sl in enumerate(learner.supervised_learners):
+        flat = _flatten(sl)
+        if flat is None:
+            file = 'supervised_learner_{}.pkl'.format(i)
+            with open(os.path.join(path, file), 'wb') as f:
+                pickle.dump(sl, f)
+            meta['supervised_learners'].append({'kind': 'pickle', 'file': file})
+            continue
+        trees, scale, init, max_depth = flat
+        first_tree = len(roots)
+        for tree in trees:
+            roots.append(offset)
+            for name in ('children_left', 'children_right'):
+                nodes[name].append(np.where(tree[name] == -1, -1, tree[name] + offset))
+            for name in ('feature', 'threshold', 'value'):
+                nodes[name].append(tree[name])
+            offset += len(tree['value'])
+        meta['supervised_learners'].append({'kind': 'trees', 'trees': [first_tree, len(roots)], 'scale': float(scale),
+                                            'init': float(init), 'max_depth': int(max_depth)})
+
+    dtypes = {'children_left': np.int64, 'children_right': np.int64, 'feature': np.int64,
+              'threshold': np.float64, 'value': np.float64}
+    for name in node_arrays:
+        array = np.concatenate(nodes[name]) if nodes[name] else np.zeros(0)
+        np.save(os.path.join(path, name + '.npy'), array.astype(dtypes[name]))
+    np.save(os.path.join(path, 'roots.npy'), np.array(roots, dtype=np.int64))
+    for name in learner_arrays:
+        array = getattr(learner, name, None)
+        if array is not None:
+            np.save(os.path.join(path, name + '.npy'), np.asarray(array, dtype=float))
+            meta[name] = True
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_model(path, mmap=True):
+    """
+    load a Strategy or learner saved by save_model
+    :param path: str, directory
+    :param mmap: [True], if True map the tree arrays into memory instead of reading them,
+                 processes loading the same file share its pages
+    :return: Strategy or learner
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    nodes = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode) for name in node_arrays}
+    roots = np.load(os.path.join(path, 'roots.npy'))
+    ends = np.r_[roots[1:], len(nodes['value'])].astype(np.int64)
+
+    learner = learner_types[meta['learner']](**meta['params'])
+    supervised_learners = deque()
+    for sl in meta['supervised_learners']:
+        if sl['kind'] == 'pickle':
+            with open(os.path.join(path, sl['file']), 'rb') as f:
+                supervised_learners.append(pickle.load(f))
+        else:
+            first, last = sl['trees']
+            supervised_learners.append(Flat_trees(nodes, roots[first:last], ends[first:last],
+                                                  sl['scale'], sl['init'], sl['max_depth']))
+    learner.supervised_learners = supervised_learners
+    # weights are adjusted in place while trading, so they are read into memory
+    for name in learner_arrays:
+        if meta.get(name):
+            setattr(learner, name, np.load(os.path.join(path, name + '.npy')))
+    if meta['learner'] == 'FTPL' and learner.weight is not None:
+        learner.active_weight = learner.weight
+    return Strategy(learner) if meta['strategy'] else learner
@@ -1,9 +1,8 @@
-from sklearn.base import clone
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn import ensemble
 import numpy as np
 from collections import deque
+from .utils import predict_matrix, state_action_matrix, train_learner, eviction_index, check_eviction
+from .utils import state_action_batch, masked_argmax
+from Profiling import recorder
 
 
 class SLA:
@@ -11,11 +10,21 @@ class SLA:
     Supervised Learner Averaging
     """
 
-    def __init__(self):
+    def __init__(self, cache=None, capacity=30, eviction=None, backend='gbr', budget=None):
         """
         initialize an instance of COS learner
+        :param cache: [None], Prediction_cache for the outputs of the supervised learners
+        :param capacity: int, maximum number of supervised learners
+        :param eviction: [None], None to stop training at capacity, 'oldest' to evict the oldest learner
+        :param backend: ['gbr'], supervised learner backend, a name in Model.backends or a callable
+        :param budget: [None], Training_budget that limits the fit of each supervised learner
         """
         self.supervised_learners = deque()
+        self.cache = cache
+        self.capacity = capacity
+        self.backend = backend
+        self.budget = budget
+        self.eviction = check_eviction(eviction, ('oldest',))
 
     def qval(self, state, action):
         """
@@ -28,8 +37,20 @@ class SLA:
             return 0.
         else:
             x = np.r_[state,action].reshape((1,-1))
-            return np.mean([sl.predict(x) for sl in self.supervised_learners])
+            return np.mean(predict_matrix(self.supervised_learners, x, self.cache))
 
+    @recorder.timed('sla.qval_batch')
+    def qval_batch(self, X):
+        """
+        compute q values for many state-action rows at once
+        :param X: 2d array, each row is [state, action]
+        :return array of values for state-action function
+        """
+        if not self.supervised_learners:
+            return np.zeros(len(X))
+        return predict_matrix(self.supervised_learners, X, self.cache).mean(axis=0)
+
+    @recorder.timed('sla.predict')
     def predict(self, state, possible_actions):
         """
         give action based on current state
@@ -37,23 +58,64 @@ class SLA:
         :param possible_actions: a list of possible actions
         :return the action to maximize the state-action function
         """
-        state_action_values = np.zeros(len(possible_actions))
-        for i in range(len(possible_actions)):
-            state_action_values[i] = self.qval(state, possible_actions[i])
+        state_action_values = self.qval_batch(state_action_matrix(state, possible_actions))
         return possible_actions[np.argmax(state_action_values)]
 
+    def predict_batch(self, states, possible_actions, mask=None):
+        """
+        give actions for many states at once, as predict does for one state
+        :param states: 2d array, one state per row
+        :param possible_actions: a list of possible actions
+        :param mask: [None], bool array (number of states, number of actions), False for actions not allowed
+        :return: array of the action for each state
+        """
+        values = self.qval_batch(state_action_batch(states, possible_actions)).reshape((len(states), -1))
+        return np.asarray(possible_actions)[masked_argmax(values, mask)]
+
+    def ensemble_weight(self):
+        """
+        weight of each supervised learner in the expected state-action function
+        :return: array of weights that sum to one
+        """
+        return np.full(len(self.supervised_learners), 1. / max(len(self.supervised_learners), 1))
+
+    def is_full(self):
+        """
+        check if the ensemble takes no more supervised learners,
+        an ensemble with an eviction policy is never full
+        :return: True if full
+        """
+        return self.eviction is None and len(self.supervised_learners) >= self.capacity
+
+    def evict(self, i):
+        """
+        remove a supervised learner from the ensemble
+        :param i: int, index of the learner
+        """
+        del self.supervised_learners[i]
+        if self.cache is not None:
+            self.cache.clear()
+
+    def add_learner(self, sl):
+        """
+        add a fitted supervised learner to the ensemble, at capacity a learner is evicted first
+        :param sl: fitted supervised learner
+        """
+        if self.eviction is not None and len(self.supervised_learners) >= self.capacity:
+            self.evict(eviction_index(self.eviction))
+        self.supervised_learners.append(sl)
+        if self.cache is not None:
+            self.cache.clear()
+
+    @recorder.timed('sla.fit')
     def fit(self, X, y):
         """
         fit the next batch of training data with a new supervised_learner
         :param X: training features [state, action]
         :param y: training labels [value of state-action function]
         """
-        if len(self.supervised_learners) >= 30:
+        if self.is_full():
             #self.supervised_learners.popleft()
             print('enough sla learner')
         else:
-            sl = ensemble.GradientBoostingRegressor(n_estimators=500, max_depth=6,
-                                                learning_rate = 0.01, loss='ls', min_samples_split=2)
-            self.supervised_learners.append(sl.fit(X, y))
-            print('accuracy is : ', sl.score(X, y))
-
+            self.add_learner(train_learner(X, y, self.backend, self.budget))
@@ -1,17 +1,42 @@
 import numpy as np
+from concurrent.futures import Future
+from .utils import train_learner
+from Profiling import recorder
+from Simulation.random_source import global_source
 
 
 class Strategy:
     """
     exploit and explore strategy
     """
-    def __init__(self, learner):
+    def __init__(self, learner, rng=None):
         """
         initialize an instance of strategy class
         it is able to take observations of state-action pairs and use the learner inside it to train and predict
         :param learner: some supervised learner
+        :param rng: [None], Random_source for exploration, also given to the learner for its own draws,
+                    if None the global np.random state and the learner keeps its source
         """
         self.learner = learner
+        self._rng = global_source
+        if rng is not None:
+            self.rng = rng
+
+    @property
+    def rng(self):
+        """
+        Random_source of the exploration
+        """
+        return self._rng
+
+    @rng.setter
+    def rng(self, rng):
+        """
+        the learner draws its random learner picks and perturbations from the same source
+        """
+        self._rng = rng
+        if hasattr(self.learner, 'rng'):
+            self.learner.rng = rng
 
     def epsilon_greedy(self, observed_states, actions, epsilon=0.05):
         """
@@ -24,38 +49,58 @@ class Strategy:
         :return: int action to make
         """
         # with probability epsilon, trading randomly
-        ran = np.random.random()
+        ran = self.rng.random()
         if ran < epsilon:  # trade randomly
-            rand_index = np.random.randint(len(actions))
+            rand_index = self.rng.integers(len(actions))
             action = actions[rand_index]
         # with probability 1-epsilon, trading greedily
         else:
             action = self.learner.predict(observed_states, actions)
         return action
 
+    def targets(self, trade_book, gamma):
+        """
+        compute the training data of one-step Sarsa target
+        notice trade book at time t matches the utility at time t in our setting,
+        :param trade_book: Trade_book, rows of time_step(t):[price(t), position(t), action(t), utility(t)]
+        :param gamma: float between (0,1) discounting factor for that person
+        :return: X [state, action], y [value of state-action function]
+        """
+        book = trade_book.to_arrays()
+        print('length of time span:', len(book['time']))
+        state_action = np.column_stack((book['price'], book['position'], book['action']))
+        X = state_action[:-2]
+        next_state_action = state_action[1:-1]
+        next_utility = book['utility'][:-2]
+        y = next_utility + gamma * self.learner.qval_batch(next_state_action)
+        return X, y
+
+    @recorder.timed('strategy.upgrade')
     def upgrade(self, trade_book, gamma):
         """
         upgrade the learner with observations of one-step Sarsa target
-        notice trade book at time t matches the utility at time t in our setting,
-        :param trade_book: dictionary of time_step(t):[price(t), position(t), cash(t), action(t)]
+        :param trade_book: Trade_book, rows of time_step(t):[price(t), position(t), action(t), utility(t)]
+        :param gamma: float between (0,1) discounting factor for that person
+        """
+        with recorder.phase('strategy.targets'):
+            X, y = self.targets(trade_book, gamma)
+        with recorder.phase('strategy.fit'):
+            self.learner.fit(X, y)
+
+    def upgrade_async(self, trade_book, gamma, executor):
+        """
+        compute the Sarsa targets now and fit the new supervised learner in the executor,
+        the learner is not changed, the caller adds the result with learner.add_learner
+        :param trade_book: Trade_book, rows of time_step(t):[price(t), position(t), action(t), utility(t)]
         :param gamma: float between (0,1) discounting factor for that person
+        :param executor: concurrent.futures executor, a thread or process pool
+        :return: Future of the fitted supervised learner, its result is None if the learner is full
         """
-        time_steps = list(trade_book)
-        time_steps.sort()
-        X = []
-        y = []
-        print('length of time span:',len(time_steps))
-        for i in range(len(time_steps)-2):
-            price = trade_book[time_steps[i]]['state']['price']
-            position = trade_book[time_steps[i]]['state']['position']
-            state = np.array((price, position))
-            action = trade_book[time_steps[i]]['action']
-            X.append(np.r_[state, action])
-            next_price = trade_book[time_steps[i+1]]['state']['price']
-            next_position = trade_book[time_steps[i+1]]['state']['position']
-            next_state = np.array((next_price, next_position))
-            next_action = trade_book[time_steps[i+1]]['action']
-            next_utility = trade_book[time_steps[i]]['utility']
-            y.append(next_utility + gamma * self.learner.qval(next_state, next_action))
-        y = np.array(y).reshape(-1,)
-        self.learner.fit(X, y)
+        X, y = self.targets(trade_book, gamma)
+        if self.learner.is_full():
+            self.learner.fit(X, y)
+            future = Future()
+            future.set_result(None)
+            return future
+        return executor.submit(train_learner, X, y, getattr(self.learner, 'backend', 'gbr'),
+                               getattr(self.learner, 'budget', None))
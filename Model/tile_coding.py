@@ -0,0 +1,127 @@
+import numpy as np
+from .utils import state_action_matrix, state_action_batch, masked_argmax
+from Profiling import recorder
+
+
+class Tile_coding:
+    """
+    online learner, a tile coded linear state-action function over price and position with one set of
+    weights per action, updated from every one-step Sarsa transition at constant cost and memory
+    """
+
+    def __init__(self, actions=(-200, -100, 0, 100, 200), price_range=(0, 100), position_range=(-1000, 1000),
+                 n_tiles=(10, 10), n_tilings=8, alpha=0.1):
+        """
+        initialize an instance of tile coding learner
+        :param actions: list of the actions the learner scores, other actions are mapped to the nearest one
+        :param price_range: tuple of lowest and highest price
+        :param position_range: tuple of lowest and highest position
+        :param n_tiles: tuple of the number of tiles over price and over position in one tiling
+        :param n_tilings: int, number of offset tilings
+        :param alpha: float, step size of one update, shared by the tilings
+        """
+        self.actions = np.sort(np.asarray(actions, dtype=float))
+        self.low = np.array([price_range[0], position_range[0]], dtype=float)
+        self.width = (np.array([price_range[1], position_range[1]], dtype=float) - self.low) / n_tiles
+        self.n_tiles = np.asarray(n_tiles)
+        self.n_tilings = n_tilings
+        self.alpha = alpha
+        # tiling k is shifted by k/n_tilings of a tile, by 3k/n_tilings over position
+        self.offsets = (np.arange(n_tilings)[:, None] * np.array([1, 3]) / n_tilings) % 1
+        self.weight = np.zeros((n_tilings, n_tiles[0] + 1, n_tiles[1] + 1, len(self.actions)))
+        self.updates = 0
+
+    def tiles(self, X):
+        """
+        active tile of every tiling for each row
+        :param X: 2d array, each row is [price, position, action]
+        :return: tuple of index arrays into weight, each of shape (number of rows, n_tilings)
+        """
+        X = np.asarray(X, dtype=float).reshape((-1, 3))
+        scaled = (X[:, None, :2] - self.low) / self.width + self.offsets
+        cells = np.clip(scaled.astype(int), 0, self.n_tiles)
+        # index of the nearest action, as in Q_table
+        nearest = np.searchsorted((self.actions[1:] + self.actions[:-1]) / 2, X[:, 2])
+        tilings = np.broadcast_to(np.arange(self.n_tilings), cells.shape[:2])
+        return tilings, cells[..., 0], cells[..., 1], np.broadcast_to(nearest[:, None], cells.shape[:2])
+
+    def qval(self, state, action):
+        """
+        compute q values for state, action
+        :param state: a list of values
+        :param action: int, some integer value
+        :return the value for state-action function
+        """
+        return self.qval_batch(np.r_[state, action].reshape((1, -1)))[0]
+
+    def qval_batch(self, X):
+        """
+        compute q values for many state-action rows at once
+        :param X: 2d array, each row is [state, action]
+        :return array of values for state-action function
+        """
+        return self.weight[self.tiles(X)].sum(axis=1)
+
+    @recorder.timed('tile_coding.predict')
+    def predict(self, state, possible_actions):
+        """
+        give action based on current state
+        :param state: a list of values
+        :param possible_actions: a list of possible actions
+        :return the action to maximize the state-action function
+        """
+        state_action_values = self.qval_batch(state_action_matrix(state, possible_actions))
+        return possible_actions[np.argmax(state_action_values)]
+
+    def predict_batch(self, states, possible_actions, mask=None):
+        """
+        give actions for many states at once, as predict does for one state
+        :param states: 2d array, one state per row
+        :param possible_actions: a list of possible actions
+        :param mask: [None], bool array (number of states, number of actions), False for actions not allowed
+        :return: array of the action for each state
+        """
+        values = self.qval_batch(state_action_batch(states, possible_actions)).reshape((len(states), -1))
+        return np.asarray(possible_actions)[masked_argmax(values, mask)]
+
+    def update(self, state, action, utility, next_state, next_action, gamma):
+        """
+        one Sarsa step on a single transition
+        :param state: state at t
+        :param action: action at t
+        :param utility: float utility at t
+        :param next_state: state at t+1
+        :param next_action: action at t+1
+        :param gamma: float between (0,1) discounting factor
+        :return: float temporal difference error
+        """
+        tiles = self.tiles(np.array([np.r_[state, action], np.r_[next_state, next_action]]))
+        values = self.weight[tiles].sum(axis=1)
+        error = utility + gamma * values[1] - values[0]
+        self.weight[tuple(index[0] for index in tiles)] += self.alpha / self.n_tilings * error
+        self.updates += 1
+        return error
+
+    def is_full(self):
+        """
+        the learner takes no supervised learners, a batch upgrade calls fit directly
+        :return: True
+        """
+        return True
+
+    @recorder.timed('tile_coding.fit')
+    def fit(self, X, y):
+        """
+        move the values of all tiles toward a batch of targets,
+        each tile takes the mean error of the rows that hit it
+        :param X: training features [state, action]
+        :param y: training labels [value of state-action function]
+        """
+        tiles = self.tiles(X)
+        error = np.asarray(y, dtype=float) - self.weight[tiles].sum(axis=1)
+        total = np.zeros(self.weight.shape)
+        count = np.zeros(self.weight.shape)
+        np.add.at(total, tiles, np.broadcast_to(error[:, None], tiles[0].shape))
+        np.add.at(count, tiles, 1)
+        hit = count > 0
+        self.weight[hit] += self.alpha / self.n_tilings * total[hit] / count[hit]
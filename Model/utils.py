@@ -0,0 +1,122 @@
+import numpy as np
+from .backends import make_estimator
+from Simulation.random_source import global_source
+
+
+def predict_matrix(learners, X, cache=None):
+    """
+    evaluate every supervised learner on all rows of X, one predict call per learner
+    :param learners: iterable of fitted supervised learners
+    :param X: 2d array of features [state, action]
+    :param cache: [None], Prediction_cache to look up the rows in first
+    :return: array (number of learners, number of rows)
+    """
+    if cache is not None:
+        return cache.predict(learners, X)
+    return np.array([sl.predict(X) for sl in learners]).reshape((-1, len(X)))
+
+
+def state_action_matrix(state, actions):
+    """
+    stack one state with each candidate action
+    :param state: a list of values
+    :param actions: a list of possible actions
+    :return: 2d array (number of actions, len(state) + 1), each row is [state, action]
+    """
+    actions = np.asarray(actions, dtype=float).reshape((-1, 1))
+    states = np.tile(np.asarray(state, dtype=float), (len(actions), 1))
+    return np.hstack((states, actions))
+
+
+def state_action_batch(states, actions):
+    """
+    stack every state with each candidate action
+    :param states: 2d array, one state per row
+    :param actions: a list of possible actions
+    :return: 2d array (number of states * number of actions, state length + 1),
+             the rows of state i are i * number of actions to (i + 1) * number of actions
+    """
+    states = np.asarray(states, dtype=float)
+    actions = np.asarray(actions, dtype=float)
+    return np.column_stack((np.repeat(states, len(actions), axis=0), np.tile(actions, len(states))))
+
+
+def masked_argmax(values, mask=None):
+    """
+    best allowed action of each state
+    :param values: 2d array (number of states, number of actions)
+    :param mask: [None], bool array of the same shape, False for actions that are not allowed
+    :return: int array, index of the best allowed action of each state
+    """
+    if mask is not None:
+        values = np.where(mask, values, -np.inf)
+    return np.argmax(values, axis=1)
+
+
+def random_allowed(mask, rng=global_source):
+    """
+    one allowed action of each state picked uniformly at random
+    :param mask: bool array (number of states, number of actions)
+    :param rng: Random_source of the draws, the global np.random state by default
+    :return: int array, index of the action of each state
+    """
+    return np.argmax(rng.uniforms(mask.shape) * mask, axis=1)
+
+
+def eviction_index(eviction, weight=None):
+    """
+    choose the supervised learner to evict from a full ensemble
+    :param eviction: str, 'oldest', 'weight' for the lowest RWM weight or 'penalty' for the highest FTPL penalty
+    :param weight: [None], array of weights or penalties of the learners
+    :return: int, index of the learner to evict
+    """
+    if eviction == 'oldest' or weight is None:
+        return 0
+    if eviction == 'weight':
+        return int(np.argmin(weight))
+    if eviction == 'penalty':
+        return int(np.argmax(weight))
+    raise ValueError('unknown eviction policy: {}'.format(eviction))
+
+
+def check_eviction(eviction, policies):
+    """
+    :param eviction: eviction policy of a learner
+    :param policies: tuple of the policies the learner supports
+    :return: the eviction policy
+    """
+    if eviction is not None and eviction not in policies:
+        raise ValueError('eviction must be None or one of {}, got {}'.format(policies, eviction))
+    return eviction
+
+
+def tree_count(sl):
+    """
+    :param sl: fitted supervised learner
+    :return: int, number of boosting rounds or trees, 1 for any other learner
+    """
+    for name in ('n_estimators_', 'n_iter_'):
+        if hasattr(sl, name):
+            return int(getattr(sl, name))
+    return len(getattr(sl, 'estimators_', [sl]))
+
+
+def train_learner(X, y, backend='gbr', budget=None):
+    """
+    fit a new supervised learner on one batch of training data,
+    this is a plain function so that it can run in a worker thread or process
+    :param X: training features [state, action]
+    :param y: training labels [value of state-action function]
+    :param backend: ['gbr'], name of a backend in Model.backends or a callable that returns an estimator
+    :param budget: [None], Training_budget that limits the fit, None to fit every round on every row
+    :return: fitted supervised learner
+    """
+    sl = make_estimator(backend)
+    if budget is None:
+        sl.fit(X, y)
+        score, scored_on = sl.score(X, y), 'train'
+    else:
+        score = budget.fit(sl, X, y)
+        scored_on = 'validation' if budget.validation else 'train'
+    print('trees : {}, {} score : {}'.format(tree_count(sl), scored_on, score))
+    return sl
@@ -0,0 +1,3 @@
+from .recorder import Recorder, recorder
+
+__all__ = ['Recorder', 'recorder']
@@ -0,0 +1,146 @@
+import json
+import atexit
+import bisect
+import functools
+from time import perf_counter
+from contextlib import nullcontext
+import numpy as np
+
+# shared no-op context used while recording is disabled
+_disabled = nullcontext()
+
+
+class _Timer:
+    """
+    context that adds its elapsed time to one phase of a recorder
+    """
+    __slots__ = ('recorder', 'name', 'start')
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc):
+        self.recorder.add(self.name, perf_counter() - self.start)
+
+
+class Recorder:
+    """
+    per phase timings and call counts of the hot paths, disabled by default,
+    every phase keeps count, total, min, max and a log spaced histogram of durations
+    """
+    # histogram bucket edges in seconds, 4 buckets per decade from 1 microsecond to 100 seconds
+    edges = np.logspace(-6, 2, 33).tolist()
+
+    def __init__(self):
+        """
+        initialize an instance of recorder
+        """
+        self.enabled = False
+        self.phases = {}
+        self._dump_path = None
+
+    def enable(self, dump_path=None):
+        """
+        start recording
+        :param dump_path: [None], json file the stats are written to when the interpreter exits
+        """
+        self.enabled = True
+        if dump_path is not None:
+            if self._dump_path is None:
+                atexit.register(lambda: self.dump(self._dump_path))
+            self._dump_path = dump_path
+
+    def disable(self):
+        """
+        stop recording, the stats are kept
+        """
+        self.enabled = False
+
+    def reset(self):
+        """
+        drop all the stats
+        """
+        self.phases = {}
+
+    def phase(self, name):
+        """
+        time a block of code
+            with recorder.phase('player.move_forward'):
+                ...
+        :param name: str, name of the phase
+        :return: context manager
+        """
+        if not self.enabled:
+            return _disabled
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """
+        decorator that times every call of a function as one phase
+        :param name: str, name of the phase
+        :return: decorator
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.add(name, perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def add(self, name, seconds):
+        """
+        add one timing to a phase
+        :param name: str, name of the phase
+        :param seconds: float duration
+        """
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = {'count': 0, 'total': 0., 'min': float('inf'), 'max': 0.,
+                                         'histogram': [0] * (len(self.edges) + 1)}
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['min'] = min(stats['min'], seconds)
+        stats['max'] = max(stats['max'], seconds)
+        stats['histogram'][bisect.bisect_right(self.edges, seconds)] += 1
+
+    def stats(self):
+        """
+        aggregated stats of every phase
+        :return: dict of phase name: {count, total, mean, min, max}
+        """
+        return {name: {'count': s['count'], 'total': s['total'], 'mean': s['total'] / s['count'],
+                       'min': s['min'], 'max': s['max']} for name, s in self.phases.items()}
+
+    def histogram(self, name):
+        """
+        histogram of the durations of one phase,
+        counts[0] is below edges[0] and counts[-1] is above edges[-1]
+        :param name: str, name of the phase
+        :return: edges, counts
+        """
+        return np.array(self.edges), np.array(self.phases[name]['histogram'])
+
+    def dump(self, path):
+        """
+        write the stats and histograms to a json file
+        :param path: str, file path
+        """
+        phases = self.stats()
+        for name in phases:
+            phases[name]['histogram'] = self.phases[name]['histogram']
+        with open(path, 'w') as f:
+            json.dump({'edges': self.edges, 'phases': phases}, f, indent=2, sort_keys=True)
+
+
+# recorder used by Player, BackTester, Strategy and the learners
+recorder = Recorder()
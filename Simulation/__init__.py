@@ -1,5 +1,10 @@
 from .ou_process import Ornstein_Uhlenbeck
+from .gbm import Geometric_BM
 from .functions import Generic_functions
 from .random_mixture_process import Random_mixture_process
+from .random_source import Random_source
+from .replay_process import Replay_process
+from .historical_process import Historical_process
 
-__all__ = ['Ornstein_Uhlenbeck', 'Generic_functions', 'Random_mixture_process']
\ No newline at end of file
+__all__ = ['Ornstein_Uhlenbeck', 'Geometric_BM', 'Generic_functions', 'Random_mixture_process', 'Random_source', 'Replay_process',
+           'Historical_process']
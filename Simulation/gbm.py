@@ -1,4 +1,5 @@
 import numpy as np
+from .random_source import global_source
 
 
 class Geometric_BM:
@@ -6,7 +7,7 @@ class Geometric_BM:
     initialize one instance of geometric brownian motion
     """
 
-    def __init__(self,current_t, cuurent_p, mu = 0.005 , sigma = 0.01, range = (0,100)):
+    def __init__(self,current_t, cuurent_p, mu = 0.005 , sigma = 0.01, range = (0,100), rng=None):
         """
         initialize the a geometric brownian motion
         :param mu: return
@@ -14,13 +15,22 @@ class Geometric_BM:
         :param range: min and max for price
         :param current_t: current time
         :param cuurent_p: current price
+        :param rng: [None], Random_source of the process, if None the global np.random state
         """
+        self.rng = rng if rng is not None else global_source
         self.mu = mu
         self.sigma = sigma
         self.range = range
         self.current_t = current_t
         self.current_p = cuurent_p
 
+    @property
+    def current_price(self):
+        """
+        the current price, same as current_p
+        """
+        return self.current_p
+
     def get_current_price(self):
         """
         get the current price
@@ -33,11 +43,17 @@ class Geometric_BM:
         move the price process one step forward
         """
         current_price = self.current_p
-        next_price = current_price + self.mu * current_price + self.sigma * current_price * np.random.normal(0,1)
+        next_price = current_price + self.mu * current_price + self.sigma * current_price * self.rng.normal()
         self.current_t += 1
         self.current_p = next_price
 
-
-
-
-
+    def simulate(self, n_paths, n_steps):
+        """
+        simulate many independent paths starting from the current price,
+        the process itself is not moved forward
+        :param n_paths: int, number of paths
+        :param n_steps: int, number of steps for each path
+        :return: array (n_paths, n_steps), price after each step
+        """
+        z = self.rng.normals((n_paths, n_steps))
+        return self.current_p * np.cumprod(1 + self.mu + self.sigma * z, axis=1)
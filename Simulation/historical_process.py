@@ -0,0 +1,163 @@
+import os
+import numpy as np
+
+
+class Historical_process:
+    """
+    price process that replays historical ticks from a file, one chunk in memory at a time:
+    a csv file is read in chunks, a .npy or raw binary file and the price column of a Trade_log directory
+    are mapped into memory, prices are rounded and kept in range as in the synthetic processes
+    """
+
+    def __init__(self, path, price_column='price', time_column=None, dtype=np.float64, decimals=1, range=(0, 100),
+                 out_of_range='reject', chunk_size=65536, start_t=0):
+        """
+        initialize an instance of historical process
+        :param path: str, .csv file, .npy file of prices, raw binary file of prices, or Trade_log directory
+        :param price_column: str, price column of a csv file
+        :param time_column: [None], time column of a csv file, if None ticks are numbered from start_t
+        :param dtype: numpy dtype of a raw binary file
+        :param decimals: [1], int decimals prices are rounded to, None to keep them as they are
+        :param range: [(0, 100)], range of prices, None for no range
+        :param out_of_range: 'reject' to keep the previous price as the synthetic processes do, or 'clip'
+        :param chunk_size: int, number of ticks in memory at a time
+        :param start_t: int, time of the first tick when the file has no time
+        """
+        if out_of_range not in ('reject', 'clip'):
+            raise ValueError("out_of_range must be 'reject' or 'clip', got {}".format(out_of_range))
+        self.path = path
+        self.price_column = price_column
+        self.time_column = time_column
+        self.dtype = dtype
+        self.decimals = decimals
+        self.range = range
+        self.out_of_range = out_of_range
+        self.chunk_size = chunk_size
+        self.start_t = start_t
+
+        # counted on first use, replaying the file does not need it
+        self._length = None
+        self.index = 0
+        self._chunks = self._read()
+        self._offset = 0
+        self._last_price = None
+        times, prices = next(self._chunks, (None, []))
+        if len(prices) == 0:
+            raise ValueError('no prices in {}'.format(path))
+        self._times, self._prices = self._clean(times, prices)
+        self.current_t = int(self._times[0])
+        self.current_price = float(self._prices[0])
+
+    @property
+    def length(self):
+        """
+        number of ticks in the history
+        """
+        if self._length is None:
+            self._length = self._count()
+        return self._length
+
+    def _count(self):
+        """
+        number of ticks in the file, the rows of a csv file are counted by the csv module without converting them,
+        so blank lines and quoted newlines are not counted as ticks
+        """
+        if os.path.isdir(self.path):
+            # a partly written row of a Trade_log is left out, as Trade_log does
+            return min(os.path.getsize(os.path.join(self.path, name + '.bin')) // np.dtype(dtype).itemsize
+                       for name, dtype in (('price', np.float64), ('time', np.int64)))
+        if self.path.endswith('.npy'):
+            return len(np.load(self.path, mmap_mode='r'))
+        if self.path.endswith('.csv'):
+            import csv
+            with open(self.path, newline='') as f:
+                rows = sum(1 for row in csv.reader(f) if row)
+            # a header row
+            return max(rows - 1, 0)
+        return os.path.getsize(self.path) // np.dtype(self.dtype).itemsize
+
+    def _read(self):
+        """
+        generator of (times, prices) chunks of the file
+        """
+        if self.path.endswith('.csv'):
+            # pandas is only needed to read csv files
+            import pandas as pd
+            columns = [self.price_column] + ([self.time_column] if self.time_column else [])
+            first = 0
+            for frame in pd.read_csv(self.path, usecols=columns, chunksize=self.chunk_size):
+                prices = frame[self.price_column].to_numpy(dtype=float)
+                if self.time_column:
+                    times = frame[self.time_column].to_numpy(dtype=np.int64)
+                else:
+                    times = self.start_t + np.arange(first, first + len(prices))
+                first += len(prices)
+                yield times, prices
+            return
+
+        times = None
+        if self.length == 0:
+            return
+        if os.path.isdir(self.path):
+            prices = np.memmap(os.path.join(self.path, 'price.bin'), dtype=np.float64, mode='r', shape=(self.length,))
+            times = np.memmap(os.path.join(self.path, 'time.bin'), dtype=np.int64, mode='r', shape=(self.length,))
+        elif self.path.endswith('.npy'):
+            prices = np.load(self.path, mmap_mode='r')
+        else:
+            prices = np.memmap(self.path, dtype=self.dtype, mode='r', shape=(self.length,))
+        for first in np.arange(0, self.length, self.chunk_size):
+            last = min(first + self.chunk_size, self.length)
+            chunk_times = np.array(times[first:last]) if times is not None else self.start_t + np.arange(first, last)
+            yield chunk_times, np.array(prices[first:last], dtype=float)
+
+    def _clean(self, times, prices):
+        """
+        round the prices of a chunk and keep them in range
+        """
+        if self.decimals is not None:
+            prices = np.round(prices, self.decimals)
+        if self.range is None:
+            return times, prices
+        if self.out_of_range == 'clip':
+            return times, np.clip(prices, self.range[0], self.range[1])
+        inside = (self.range[0] <= prices) & (prices <= self.range[1])
+        if inside.all():
+            self._last_price = prices[-1]
+            return times, prices
+        # an out of range tick keeps the last price in range, carried over from the previous chunk
+        source = np.maximum.accumulate(np.where(inside, np.arange(len(prices)), -1))
+        previous = self._last_price if self._last_price is not None else np.clip(prices[0], *self.range)
+        prices = np.where(source >= 0, prices[np.maximum(source, 0)], previous)
+        self._last_price = prices[-1]
+        return times, prices
+
+    @property
+    def total_time(self):
+        """
+        number of steps left in the history
+        """
+        return self.length - 1 - self.index
+
+    def get_current_price(self):
+        """
+        get the current price
+        :return: float price, int time
+        """
+        return self.current_t, self.current_price
+
+    def move_forward(self):
+        """
+        move the price process one step forward, the last price is kept once the history ends
+        """
+        if self.index + 1 - self._offset == len(self._prices):
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                # the history ends at the last tick read, even if more were counted, e.g. in a truncated file
+                self._length = self.index + 1
+                return
+            self._offset = self.index + 1
+            self._times, self._prices = self._clean(*chunk)
+        self.index += 1
+        self.current_t = int(self._times[self.index - self._offset])
+        self.current_price = float(self._prices[self.index - self._offset])
@@ -1,5 +1,26 @@
 import numpy as np
-import matplotlib.pyplot as plt
+from .random_source import global_source
+
+
+def ou_step(price, z, base_in, base_out, theta, mu, sigma, range):
+    """
+    vectorized one step OU move on the log scale, rounded to 0.1,
+    moves that fall outside range are rejected and the old price is kept
+    :param price: array of current prices
+    :param z: array of standard normal draws, same shape as price
+    :param base_in: float or array, price level used to compute the log deviation
+    :param base_out: float or array, price level used to map the log deviation back
+    :param theta: float parameter
+    :param mu: float parameter
+    :param sigma: float parameter
+    :param range: range for price movement
+    :return: array of next prices
+    """
+    current_x = np.log(price / base_in)
+    current_x = current_x + theta * (mu - current_x) + sigma * z
+    temp_price = np.round(np.exp(current_x) * base_out, 1)
+    inside = (range[0] <= temp_price) & (temp_price <= range[1])
+    return np.where(inside, temp_price, price)
 
 
 class Ornstein_Uhlenbeck:
@@ -7,7 +28,7 @@ class Ornstein_Uhlenbeck:
     define the OU process
     """
 
-    def __init__(self, current_t = 0, cuurent_p = 50, theta=np.log(2) / 5, mu=0, sigma=.15, range = (0,100)):
+    def __init__(self, current_t = 0, cuurent_p = 50, theta=np.log(2) / 5, mu=0, sigma=.15, range = (0,100), rng=None):
         """
         simulate OU process according to:
         X_n+1 = X_n + theta(mu - X_n)dt + sigma sqrt(dt) N~(0,1)
@@ -15,7 +36,9 @@ class Ornstein_Uhlenbeck:
         :param mu: float parameter
         :param sigma: float parameter
         :param range: range for price movement
+        :param rng: [None], Random_source of the process, if None the global np.random state
         """
+        self.rng = rng if rng is not None else global_source
         self.mu = mu
         self.sigma = sigma
         self.theta = theta
@@ -36,9 +59,24 @@ class Ornstein_Uhlenbeck:
         move the price process one step forward
         """
         current_x = np.log(self.current_price / self.p0)
-        current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * np.random.normal(0, 1)
+        current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * self.rng.normal()
         temp_price = round(np.exp(current_x) * self.p0, 1)
         if self.range[0] <= temp_price <= self.range[1]:
             self.current_price = temp_price
         self.current_t += 1
 
+    def simulate(self, n_paths, n_steps):
+        """
+        simulate many independent paths starting from the current price,
+        the process itself is not moved forward
+        :param n_paths: int, number of paths
+        :param n_steps: int, number of steps for each path
+        :return: array (n_paths, n_steps), price after each step
+        """
+        z = self.rng.normals((n_paths, n_steps))
+        paths = np.empty((n_paths, n_steps))
+        price = np.full(n_paths, self.current_price, dtype=float)
+        for t in range(n_steps):
+            price = ou_step(price, z[:, t], self.p0, self.p0, self.theta, self.mu, self.sigma, self.range)
+            paths[:, t] = price
+        return paths
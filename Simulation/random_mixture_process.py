@@ -1,12 +1,23 @@
 import numpy as np
+from .ou_process import ou_step
+from .random_source import global_source
 
 
 class Random_mixture_process:
     """
     random mixture of several price processes
     """
+    # each regime is an OU process on log(price / (p0 + shift_in)) mapped back with p0 + shift_out
+    shift_in = np.array([0, 10, -20, -10])
+    shift_out = np.array([0, -10, 10, 20])
+
     def __init__(self, prob_list = [.25, .25, .25, .25], start_t = 0, p0 = 80, range = [1,100],
-                 theta=np.log(2) / 5, mu=0, sigma=.15, r = 0.1, s = 0.05, threshold = 100):
+                 theta=np.log(2) / 5, mu=0, sigma=.15, r = 0.1, s = 0.05, threshold = 100, rng=None):
+        """
+        initialize a random mixture process
+        :param rng: [None], Random_source of the process, if None the global np.random state
+        """
+        self.rng = rng if rng is not None else global_source
         self.mu = mu
         self.sigma = sigma
         self.theta = theta
@@ -19,7 +30,7 @@ class Random_mixture_process:
         self.range = range
         self.threshold = threshold
         self.remaining_time = self.threshold
-        self.indicator = np.random.choice([0, 1, 2, 3], p = self.prob_list)
+        self.indicator = self.rng.choice(4, p = self.prob_list)
 
     def get_current_price(self):
         """
@@ -32,7 +43,7 @@ class Random_mixture_process:
         """
         change the market regime once time reaches threshold
         """
-        rand = np.random.random(4)
+        rand = self.rng.uniforms(4)
         self.prob_list = rand/np.sum(rand)
 
     def in_process(self):
@@ -54,39 +65,51 @@ class Random_mixture_process:
         else:
             self.remaining_time = self.threshold
             self.remaining_time -= 1
-            self.indicator = np.random.choice([0, 1, 2, 3], p=self.prob_list)
-
-        indicator = self.indicator
-
-        if indicator == 0: # OU process
-            current_x = np.log(self.current_price / self.p0)
-            current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * np.random.normal(0, 1)
-            temp_price = round(np.exp(current_x) * self.p0, 1)
-            if self.range[0] <= temp_price <= self.range[1]:
-                self.current_price = temp_price
-            self.current_t += 1
+            self.indicator = self.rng.choice(4, p=self.prob_list)
 
-        elif indicator == 1:
-            current_x = np.log(self.current_price / (self.p0+10))
-            current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * np.random.normal(0, 1)
-            temp_price = round(np.exp(current_x) * (self.p0-10), 1)
-            if self.range[0] <= temp_price <= self.range[1]:
-                self.current_price = temp_price
-            self.current_t += 1
+        base_in = self.p0 + self.shift_in[self.indicator]
+        base_out = self.p0 + self.shift_out[self.indicator]
+        current_x = np.log(self.current_price / base_in)
+        current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * self.rng.normal()
+        temp_price = round(np.exp(current_x) * base_out, 1)
+        if self.range[0] <= temp_price <= self.range[1]:
+            self.current_price = temp_price
+        self.current_t += 1
 
-        elif indicator == 2:
-            current_x = np.log(self.current_price / (self.p0-20))
-            current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * np.random.normal(0, 1)
-            temp_price = round(np.exp(current_x) * (self.p0+10), 1)
-            if self.range[0] <= temp_price <= self.range[1]:
-                self.current_price = temp_price
-            self.current_t += 1
-
-        elif indicator == 3:
-            current_x = np.log(self.current_price / (self.p0-10))
-            current_x = current_x + self.theta * (self.mu - current_x) + self.sigma * np.random.normal(0, 1)
-            temp_price = round(np.exp(current_x) * (self.p0 + 20), 1)
-            if self.range[0] <= temp_price <= self.range[1]:
-                self.current_price = temp_price
-            self.current_t += 1
+    def regime_schedule(self, n_paths, n_steps):
+        """
+        draw the regime of every step for many paths, block by block,
+        the first block continues the current regime for the remaining time of the circle
+        :param n_paths: int, number of paths
+        :param n_steps: int, number of steps for each path
+        :return: int array (n_paths, n_steps) of regime indicators
+        """
+        head = max(min(self.remaining_time - 1, n_steps), 0)
+        # move_forward draws a regime and keeps it for threshold - 1 steps
+        block = max(self.threshold - 1, 1)
+        n_blocks = int(np.ceil((n_steps - head) / block))
+        blocks = self.rng.choices(4, (n_paths, n_blocks), p=self.prob_list)
+        schedule = np.empty((n_paths, n_steps), dtype=int)
+        schedule[:, :head] = self.indicator
+        schedule[:, head:] = np.repeat(blocks, block, axis=1)[:, :n_steps - head]
+        return schedule
 
+    def simulate(self, n_paths, n_steps):
+        """
+        simulate many independent paths starting from the current state,
+        the process itself is not moved forward
+        :param n_paths: int, number of paths
+        :param n_steps: int, number of steps for each path
+        :return: array (n_paths, n_steps), price after each step
+        """
+        schedule = self.regime_schedule(n_paths, n_steps)
+        base_in = self.p0 + self.shift_in[schedule]
+        base_out = self.p0 + self.shift_out[schedule]
+        z = self.rng.normals((n_paths, n_steps))
+        paths = np.empty((n_paths, n_steps))
+        price = np.full(n_paths, self.current_price, dtype=float)
+        for t in range(n_steps):
+            price = ou_step(price, z[:, t], base_in[:, t], base_out[:, t],
+                            self.theta, self.mu, self.sigma, self.range)
+            paths[:, t] = price
+        return paths
@@ -0,0 +1,124 @@
+import numpy as np
+
+
+class Random_source:
+    """
+    seedable random stream owned by one price process or strategy,
+    single normals and uniforms are handed out from large pre-drawn blocks
+    """
+
+    def __init__(self, seed=None, block_size=4096):
+        """
+        initialize an instance of random source
+        :param seed: [None], int or SeedSequence, None for fresh entropy
+        :param block_size: int, number of values drawn at once
+        """
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self.block_size = block_size
+        self._normals = []
+        self._normal_index = 0
+        self._uniforms = []
+        self._uniform_index = 0
+
+    def spawn(self, n):
+        """
+        independent child streams, e.g. one per path or per worker
+        :param n: int, number of children
+        :return: list of Random_source
+        """
+        return [Random_source(child, self.block_size) for child in self.seed_sequence.spawn(n)]
+
+    def normal(self):
+        """
+        :return: float, one standard normal draw
+        """
+        if self._normal_index == len(self._normals):
+            self._normals = self.generator.standard_normal(self.block_size).tolist()
+            self._normal_index = 0
+        value = self._normals[self._normal_index]
+        self._normal_index += 1
+        return value
+
+    def random(self):
+        """
+        :return: float, one uniform draw in [0, 1)
+        """
+        if self._uniform_index == len(self._uniforms):
+            self._uniforms = self.generator.random(self.block_size).tolist()
+            self._uniform_index = 0
+        value = self._uniforms[self._uniform_index]
+        self._uniform_index += 1
+        return value
+
+    def integers(self, n):
+        """
+        :param n: int, upper bound
+        :return: int, one uniform draw in [0, n)
+        """
+        return int(self.random() * n)
+
+    def choice(self, n, p):
+        """
+        :param n: int, number of outcomes
+        :param p: probability of each outcome
+        :return: int, one draw in [0, n) with probability p
+        """
+        cdf = np.cumsum(p)
+        return min(int(np.searchsorted(cdf, self.random() * cdf[-1], side='right')), n - 1)
+
+    def normals(self, size):
+        """
+        :param size: int or tuple, shape of the array
+        :return: array of standard normal draws
+        """
+        return self.generator.standard_normal(size)
+
+    def uniforms(self, size, low=0., high=1.):
+        """
+        :param size: int or tuple, shape of the array
+        :param low: float, lower bound
+        :param high: float, upper bound
+        :return: array of uniform draws in [low, high)
+        """
+        return self.generator.uniform(low, high, size)
+
+    def choices(self, n, size, p):
+        """
+        :param n: int, number of outcomes
+        :param size: int or tuple, shape of the array
+        :param p: probability of each outcome
+        :return: int array of draws in [0, n) with probability p
+        """
+        return self.generator.choice(n, size=size, p=p)
+
+
+class Global_source:
+    """
+    random stream backed by the global np.random state, the default of processes and strategies,
+    it draws exactly what np.random.seed made reproducible before
+    """
+
+    def normal(self):
+        return np.random.normal(0, 1)
+
+    def random(self):
+        return np.random.random()
+
+    def integers(self, n):
+        return np.random.randint(n)
+
+    def choice(self, n, p):
+        return np.random.choice(n, p=p)
+
+    def normals(self, size):
+        return np.random.normal(0, 1, size)
+
+    def uniforms(self, size, low=0., high=1.):
+        return np.random.uniform(low, high, size)
+
+    def choices(self, n, size, p):
+        return np.random.choice(n, size=size, p=p)
+
+
+global_source = Global_source()
@@ -0,0 +1,39 @@
+class Replay_process:
+    """
+    price process that replays a recorded path of prices
+    """
+
+    def __init__(self, times, prices):
+        """
+        initialize a replay of a recorded path, the arrays are not copied
+        :param times: int array of time steps
+        :param prices: float array of prices
+        """
+        self.times = times
+        self.prices = prices
+        self.index = 0
+        self.current_t = int(times[0])
+        self.current_price = float(prices[0])
+
+    @property
+    def total_time(self):
+        """
+        number of steps left in the recording
+        """
+        return len(self.prices) - 1 - self.index
+
+    def get_current_price(self):
+        """
+        get the current price
+        :return: float price, int time
+        """
+        return self.current_t, self.current_price
+
+    def move_forward(self):
+        """
+        move the price process one step forward, the last price is kept once the recording ends
+        """
+        if self.index + 1 < len(self.prices):
+            self.index += 1
+            self.current_t = int(self.times[self.index])
+            self.current_price = float(self.prices[self.index])
@@ -0,0 +1,247 @@
+"""
+benchmark of the hot paths: trading loop, strategy upgrade, single decision predict and price simulation
+
+    python -m Test.benchmark --output bench.json
+    python -m Test.benchmark --baseline bench.json --tolerance 0.2
+
+results are written as json, names ending in per_sec or r2 are better when higher, all others are times
+and better when lower; with --baseline the run fails if any result is worse than the tolerance allows,
+relative to the baseline for rates and times and absolute for r2 scores, which can be negative
+"""
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+from Simulation import Ornstein_Uhlenbeck
+from Simulation import Geometric_BM
+from Simulation import Random_mixture_process
+from Simulation import Generic_functions
+from Data import Player
+from Model import Strategy
+from Model import SLA
+from Model import RWM
+from Model import FTPL
+from Model.utils import train_learner
+from Model.backends import backends
+
+learners = {'sla': SLA, 'rwm': RWM, 'ftpl': FTPL}
+actions = [-200, -100, 0, 100, 200]
+
+
+def trading_cost(x):
+    return Generic_functions.trading_cost(x, 10, 0.1)
+
+
+def utility_function(x):
+    return Generic_functions.utility_function(x, 0.0001)
+
+
+def base_learner(seed, rows=1000):
+    """
+    fit one supervised learner on a trading path, it is shared by every benchmark ensemble
+    :param seed: int random seed
+    :param rows: int, number of training rows
+    :return: fitted supervised learner
+    """
+    np.random.seed(seed)
+    player = Player(Random_mixture_process(p0=70), utility_function, trading_cost, Strategy(SLA()), model='sla')
+    for _ in range(rows + 2):
+        player.trade_greedy_one_step(1.)
+    X, y = player.strategy.targets(player.trade_book, player.gamma)
+    return train_learner(X, y)
+
+
+def make_learner(name, sl, size):
+    """
+    a learner holding size copies of the same supervised learner
+    :param name: str, sla, rwm or ftpl
+    :param sl: fitted supervised learner
+    :param size: int ensemble size
+    :return: learner
+    """
+    learner = learners[name]()
+    for _ in range(size):
+        learner.add_learner(sl)
+    return learner
+
+
+def bench_trading(sl, sizes, steps, seed):
+    """
+    steps per second of Player.trade_greedy_one_step
+    """
+    results = {}
+    for name in learners:
+        for size in sizes:
+            np.random.seed(seed)
+            player = Player(Random_mixture_process(p0=70), utility_function, trading_cost,
+                            Strategy(make_learner(name, sl, size)), model=name)
+            start = time.perf_counter()
+            for _ in range(steps):
+                player.trade_greedy_one_step(.05)
+            results['trade_greedy.{}.{}.steps_per_sec'.format(name, size)] = steps / (time.perf_counter() - start)
+    return results
+
+
+def bench_upgrade(sl, batch_sizes, size, seed):
+    """
+    seconds of Strategy.upgrade split into Sarsa targets and fit
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        np.random.seed(seed)
+        player = Player(Random_mixture_process(p0=70), utility_function, trading_cost,
+                        Strategy(make_learner('sla', sl, size)), model='sla')
+        for _ in range(batch_size + 2):
+            player.trade_greedy_one_step(1.)
+        start = time.perf_counter()
+        X, y = player.strategy.targets(player.trade_book, player.gamma)
+        middle = time.perf_counter()
+        player.strategy.learner.fit(X, y)
+        end = time.perf_counter()
+        results['upgrade.{}.targets_sec'.format(batch_size)] = middle - start
+        results['upgrade.{}.fit_sec'.format(batch_size)] = end - middle
+    return results
+
+
+def bench_predict(sl, sizes, calls, seed):
+    """
+    latency percentiles in microseconds of one learner.predict decision
+    """
+    results = {}
+    for name in learners:
+        for size in sizes:
+            np.random.seed(seed)
+            learner = make_learner(name, sl, size)
+            states = np.column_stack((np.round(np.random.uniform(20, 90, calls), 1),
+                                      100 * np.random.randint(-10, 11, calls)))
+            latency = np.zeros(calls)
+            for i in range(calls):
+                start = time.perf_counter()
+                learner.predict(states[i], actions)
+                latency[i] = time.perf_counter() - start
+            for q in (50, 90, 99):
+                results['predict.{}.{}.p{}_us'.format(name, size, q)] = np.percentile(latency, q) * 1e6
+    return results
+
+
+def bench_backends(batch_sizes, calls, seed):
+    """
+    fit seconds, single row predict latency in microseconds and out of sample r2 of each learner backend,
+    trained on the Sarsa targets of a trading path and scored on the targets of a second path
+    """
+    results = {}
+    for batch_size in batch_sizes:
+        data = []
+        for path_seed in (seed, seed + 1):
+            np.random.seed(path_seed)
+            player = Player(Random_mixture_process(p0=70), utility_function, trading_cost, Strategy(SLA()), model='sla')
+            for _ in range(batch_size + 2):
+                player.trade_greedy_one_step(1.)
+            data.append(player.strategy.targets(player.trade_book, player.gamma))
+        (X, y), (X_test, y_test) = data
+        for name in backends:
+            start = time.perf_counter()
+            sl = train_learner(X, y, name)
+            results['backend.{}.{}.fit_sec'.format(name, batch_size)] = time.perf_counter() - start
+            latency = np.zeros(min(calls, len(X_test)))
+            for i in range(len(latency)):
+                start = time.perf_counter()
+                sl.predict(X_test[i:i + 1])
+                latency[i] = time.perf_counter() - start
+            results['backend.{}.{}.p50_us'.format(name, batch_size)] = np.percentile(latency, 50) * 1e6
+            results['backend.{}.{}.r2'.format(name, batch_size)] = sl.score(X_test, y_test)
+    return results
+
+
+def bench_simulation(steps, n_paths, seed):
+    """
+    steps per second of move_forward and of simulate for each price process
+    """
+    processes = {'ou': lambda: Ornstein_Uhlenbeck(),
+                 'gbm': lambda: Geometric_BM(0, 50, mu=0., sigma=0.01),
+                 'mixture': lambda: Random_mixture_process(p0=70)}
+    results = {}
+    for name, factory in processes.items():
+        np.random.seed(seed)
+        process = factory()
+        start = time.perf_counter()
+        for _ in range(steps):
+            process.move_forward()
+        results['simulation.{}.move_forward.steps_per_sec'.format(name)] = steps / (time.perf_counter() - start)
+        start = time.perf_counter()
+        process.simulate(n_paths, steps)
+        results['simulation.{}.simulate.steps_per_sec'.format(name)] = n_paths * steps / (time.perf_counter() - start)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    find the results that are worse than the baseline by more than the tolerance
+    :param results: dict of name: value
+    :param baseline: dict of name: value
+    :param tolerance: float, allowed relative change, an absolute change for r2 scores which can be negative
+    :return: list of (name, baseline value, value)
+    """
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        if name.endswith('r2'):
+            worse = value < old - tolerance
+        elif name.endswith('per_sec'):
+            worse = value < old * (1 - tolerance)
+        else:
+            worse = value > old * (1 + tolerance)
+        if worse:
+            regressions.append((name, old, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the trading, training, inference and simulation hot paths')
+    parser.add_argument('--seed', type=int, default=10)
+    parser.add_argument('--quick', action='store_true', help='small sizes for a smoke run')
+    parser.add_argument('--output', help='write the results to this json file')
+    parser.add_argument('--baseline', help='json file of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        sizes, steps, batch_sizes, calls, sim_steps, n_paths = [1, 5], 200, [500], 200, 2000, 100
+    else:
+        sizes, steps, batch_sizes, calls, sim_steps, n_paths = [1, 5, 15, 30], 1000, [1000, 5000, 20000], 1000, 100000, 1000
+    # the upgrade ensemble must still take a new learner
+    upgrade_size = max(size for size in sizes if size < 15)
+
+    sl = base_learner(args.seed)
+    results = {}
+    results.update(bench_trading(sl, sizes, steps, args.seed))
+    results.update(bench_upgrade(sl, batch_sizes, upgrade_size, args.seed))
+    results.update(bench_predict(sl, sizes, calls, args.seed))
+    results.update(bench_backends(batch_sizes, calls, args.seed))
+    results.update(bench_simulation(sim_steps, n_paths, args.seed))
+
+    report = {'meta': {'seed': args.seed, 'quick': args.quick, 'python': platform.python_version(),
+                       'numpy': np.__version__, 'machine': platform.machine(), 'time': time.time()},
+              'results': results}
+    for name in sorted(results):
+        print('{:<50s} {:>14.3f}'.format(name, results[name]))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print('regression: {} {:.3f} -> {:.3f}'.format(name, old, new))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+"""
+consistency checks of the fast paths against the behaviour they replace
+
+    python -m Test.consistency
+
+every check raises AssertionError with a message on failure, the run fails if any check fails
+"""
+import sys
+import functools
+import os
+import tempfile
+import warnings
+import numpy as np
+from Simulation import Replay_process
+from Simulation import Generic_functions
+from Simulation import Random_source
+from Simulation import Random_mixture_process
+from Simulation import Historical_process
+from Data import Player
+from Data import Trade_book
+from Data import Trade_log
+from Model import Strategy
+from Model import SLA
+from Model import RWM
+from Model import FTPL
+from Model import Q_table
+from Model import Tile_coding
+from Model import Training_budget
+from Model.backends import make_estimator
+from Model import save_model, load_model
+from BackTester import BackTester
+from BackTester import Running_metrics
+from BackTester.evaluation import run_path
+
+
+def check_evaluation_paths_explore_independently():
+    """
+    every evaluation path has its own exploration stream, the trained player's stream is not replayed
+    """
+    prices = np.round(50 + 10 * np.sin(np.arange(301) / 10.), 1)
+    factory = functools.partial(Replay_process, np.arange(301), prices)
+    player = Player(factory(), functools.partial(Generic_functions.utility_function, k=0.0001),
+                    functools.partial(Generic_functions.trading_cost, mul=10, ts=0.1),
+                    Strategy(SLA(), rng=Random_source(5)), model='sla')
+    # with epsilon 1 every action is an exploration draw and the prices are the same on every path
+    first = run_path(player, 1, factory, test_size=300, epsilon=1.)
+    second = run_path(player, 2, factory, test_size=300, epsilon=1.)
+    again = run_path(player, 1, factory, test_size=300, epsilon=1.)
+    assert first != second, 'paths with different seeds made the same exploration draws'
+    assert first == again, 'a path is not reproducible from its seed'
+
+
+class _Counting_source(Random_source):
+    """
+    random source that counts the regime draws of move_forward and numbers the blocks of regime_schedule,
+    so every block of the schedule is its own run
+    """
+
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.draws = 0
+
+    def choice(self, n, p):
+        self.draws += 1
+        return super().choice(n, p)
+
+    def choices(self, n, size, p):
+        return np.arange(np.prod(size)).reshape(size)
+
+
+def _run_starts(changes, n_steps):
+    return [0] + [t for t in range(1, n_steps) if changes[t]]
+
+
+def check_regime_schedule_matches_move_forward():
+    """
+    the batch regime schedule redraws the regime at the same steps as move_forward
+    """
+    n_steps = 1000
+    for threshold in (2, 7, 100):
+        for warm_up in (0, 1, threshold // 2, threshold - 1):
+            process = Random_mixture_process(threshold=threshold, rng=_Counting_source(threshold))
+            for _ in range(warm_up):
+                process.move_forward()
+            schedule = process.regime_schedule(1, n_steps)[0]
+            draws = []
+            for _ in range(n_steps):
+                before = process.rng.draws
+                process.move_forward()
+                draws.append(process.rng.draws > before)
+            expected = _run_starts(draws, n_steps)
+            found = _run_starts(np.r_[False, np.diff(schedule) != 0], n_steps)
+            assert expected == found, 'threshold {} after {} steps: move_forward redraws at {}, schedule at {}'.format(
+                threshold, warm_up, expected[:5], found[:5])
+
+
+def check_backtests_continue_the_trade_log():
+    """
+    a backtest starts at the time of the price process, so consecutive backtests append to one log in order,
+    and the log refuses rows that do not come after its last time
+    """
+    prices = np.round(50 + 10 * np.sin(np.arange(201) / 10.), 1)
+    process = Replay_process(np.arange(100, 301), prices)
+    player = Player(process, functools.partial(Generic_functions.utility_function, k=0.0001),
+                    functools.partial(Generic_functions.trading_cost, mul=10, ts=0.1),
+                    Strategy(SLA(), rng=Random_source(5)), model='sla')
+    with tempfile.TemporaryDirectory() as path:
+        log = Trade_log(path)
+        tester = BackTester(process, player)
+        tester.backtest(total_time=50, trade_log=log)
+        tester.backtest(total_time=50, trade_log=log)
+        time = np.asarray(log.to_arrays()['time'])
+        assert time[0] == 100, 'the first backtest starts at {}, not at the time of the process'.format(time[0])
+        assert np.array_equal(time, np.arange(100, 200)), 'consecutive backtests did not log every step once'
+        try:
+            log.append(Trade_book.from_arrays(time[:2], np.ones(2), np.zeros(2), np.zeros(2), np.zeros(2),
+                                              np.zeros(2)))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('the log accepted rows from before its last time')
+
+
+def check_flat_trees_match_sklearn():
+    """
+    saved trees predict as the sklearn estimators they were flattened from, for batches walked all trees together,
+    one tree at a time and across chunks, and for forests too deep for the complete layout
+    """
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    rng = np.random.default_rng(0)
+    X = np.c_[rng.uniform(30, 110, 2000), rng.choice(np.arange(-1000, 1001, 100), 2000)]
+    y = np.sin(X[:, 0] / 7) * X[:, 1] / 100 + rng.normal(0, .1, 2000)
+    learner = SLA()
+    learner.supervised_learners.extend([GradientBoostingRegressor(n_estimators=50, max_depth=6).fit(X, y),
+                                        RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)])
+    with tempfile.TemporaryDirectory() as path:
+        save_model(learner, path)
+        loaded = load_model(path, mmap=False)
+    for sl, flat in zip(learner.supervised_learners, loaded.supervised_learners):
+        for n_rows in (1, flat.min_rows - 1, flat.min_rows, flat.chunk_size + 1):
+            X_test = np.c_[rng.uniform(20, 120, n_rows), rng.choice(np.arange(-1000, 1001, 100), n_rows)]
+            error = np.abs(sl.predict(X_test) - flat.predict(X_test)).max()
+            assert error < 1e-9, '{} trees differ by {} on {} rows'.format(type(sl).__name__, error, n_rows)
+
+
+def check_historical_csv_ends_at_its_last_row():
+    """
+    a csv file with quoted newlines and trailing blank lines replays exactly its rows, counted only when asked for,
+    a trade log replays the rows complete in both its time and price columns,
+    and moving past the end of the history, even a miscounted one, keeps the last price
+    """
+    with tempfile.TemporaryDirectory() as path:
+        file = os.path.join(path, 'ticks.csv')
+        with open(file, 'w') as f:
+            f.write('time,price,note\n')
+            for t in range(10):
+                f.write('{},{},"tick\n{}"\n'.format(100 + t, 50 + t, t))
+            f.write('\n\n')
+        for chunk_size in (3, 10, 100):
+            process = Historical_process(file, time_column='time', chunk_size=chunk_size)
+            assert process._length is None, 'the file was counted before its length was asked for'
+            assert process.length == 10, 'counted {} rows of 10'.format(process.length)
+            assert process.total_time == 9, 'total_time is {}, not 9'.format(process.total_time)
+            # as if the file had been truncated after it was counted
+            process._length += 5
+            for _ in range(20):
+                process.move_forward()
+            assert process.get_current_price() == (109, 59.), 'the history ends at {}'.format(
+                process.get_current_price())
+            assert process.total_time == 0, 'total_time is {} at the end of the history'.format(process.total_time)
+        # a trade log whose price column holds one more row than its time column
+        log = Trade_log(os.path.join(path, 'log'))
+        log.append(Trade_book.from_arrays(np.arange(100, 110), np.arange(50., 60.), np.zeros(10), np.zeros(10),
+                                          np.zeros(10), np.zeros(10)), complete=False)
+        with open(log._file('price'), 'ab') as f:
+            f.write(np.float64(60.).tobytes())
+        process = Historical_process(log.path)
+        assert process.length == 10, 'counted {} rows of a log with 10 times'.format(process.length)
+        for _ in range(20):
+            process.move_forward()
+        assert process.get_current_price() == (109, 59.), 'the log replay ends at {}'.format(
+            process.get_current_price())
+
+
+def check_fast_backtest_on_a_coarse_position_grid():
+    """
+    fast_backtest trades positions off the table grid as the nearest grid position, within the threshold
+    """
+    prices = np.round(50 + 10 * np.sin(np.arange(501) / 10.), 1)
+    factory = functools.partial(Replay_process, np.arange(501), prices)
+    player = Player(factory(), functools.partial(Generic_functions.utility_function, k=0.0001),
+                    functools.partial(Generic_functions.trading_cost, mul=10, ts=0.1), Strategy(SLA()), model='sla')
+    actions, threshold = [-200, -100, 0, 100, 200], (-1000, 1000)
+    grid = np.round(np.arange(0, 100.05, .1), 1)
+    table = Q_table(np.random.default_rng(3).normal(size=(len(grid), 2, 5)), grid, [0, 500], actions)
+    tester = BackTester(factory(), player)
+    tester.fast_backtest(table, total_time=500, threshold=threshold, action=actions)
+    # one step at a time: the q values of the nearest grid state, the threshold on the position itself
+    expected = [0.]
+    for price in prices[:-1]:
+        q_values = table.values[table.price_index(price), table.position_index(expected[-1])]
+        allowed = [threshold[0] <= expected[-1] + a <= threshold[1] for a in actions]
+        expected.append(expected[-1] + actions[int(np.argmax(np.where(allowed, q_values, -np.inf)))])
+    assert np.array_equal(tester.df_trade['position'].to_numpy(), expected), 'fast_backtest positions differ'
+
+
+def check_tile_coding_compiles_to_a_q_table():
+    """
+    a Q table compiled from a tile coding learner holds the learner's values on the grid
+    """
+    rng = np.random.default_rng(4)
+    learner = Tile_coding()
+    X = np.c_[rng.uniform(0, 100, 5000), rng.choice(np.arange(-1000, 1001, 100), 5000),
+              rng.choice(learner.actions, 5000)]
+    learner.fit(X, np.sin(X[:, 0] / 7) + X[:, 1] / 1000)
+    table = Q_table.compile(learner, positions=np.arange(-1000, 1001, 500))
+    rows = np.c_[table.prices[rng.integers(len(table.prices), size=100)], rng.choice(table.positions, 100),
+                 rng.choice(table.actions, 100)]
+    assert np.array_equal(table.qval_batch(rows), learner.qval_batch(rows)), 'the table differs from the learner'
+
+
+def check_budget_stops_on_the_time_ordered_tail():
+    """
+    hist_gbr stops early on the last rows of the batch, and warns that it does not honor max_seconds,
+    gbr stops on time without a warning
+    """
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(2000, 3))
+    # the last rows follow the opposite relation, so the validation loss grows from the first round
+    y = np.r_[X[:1600, 0], -X[1600:, 0]]
+    budget = Training_budget(max_seconds=1., validation=.2, patience=5)
+    sl = make_estimator('hist_gbr')
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        budget.fit(sl, X, y)
+    assert sl.n_iter_ <= budget.patience + 1, 'hist_gbr ran {} rounds past the best validation loss'.format(
+        sl.n_iter_ - 1)
+    assert any('max_seconds' in str(w.message) for w in caught), 'no warning that hist_gbr ignores max_seconds'
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        budget.fit(make_estimator('gbr'), X, y)
+    assert not any('max_seconds' in str(w.message) for w in caught), 'gbr warned that it ignores max_seconds'
+
+
+def _seeded_draws(learner, global_seed):
+    """
+    actions and q values of a strategy with its own stream, after seeding the global state with global_seed
+    """
+    from sklearn.tree import DecisionTreeRegressor
+    rng = np.random.default_rng(6)
+    X = np.c_[rng.uniform(30, 70, 500), rng.choice(np.arange(-1000, 1001, 100), 500), rng.choice([-100, 0, 100], 500)]
+    for depth in (2, 3, 4):
+        learner.add_learner(DecisionTreeRegressor(max_depth=depth, random_state=0).fit(X, rng.normal(size=500)))
+    strategy = Strategy(learner, rng=Random_source(7))
+    np.random.seed(global_seed)
+    before = np.random.get_state()[1].copy()
+    actions = [strategy.epsilon_greedy([50., 0.], [-100, 0, 100], .3) for _ in range(50)]
+    mask = rng.random((20, 3)) < .7
+    mask[:, 1] = True
+    batch = learner.predict_batch(X[:20, :2], [-100, 0, 100], mask)
+    values = learner.qval_batch(X[:20])
+    assert np.array_equal(np.random.get_state()[1], before), '{} drew from the global state'.format(
+        type(learner).__name__)
+    return actions, batch.tolist(), values.tolist()
+
+
+def check_seeded_learners_own_their_draws():
+    """
+    RWM learner picks and FTPL perturbations come from the strategy's stream, not from the global state
+    """
+    for learner_type in (RWM, FTPL):
+        first = _seeded_draws(learner_type(), 1)
+        second = _seeded_draws(learner_type(), 2)
+        assert first == second, '{} draws depend on the global state'.format(learner_type.__name__)
+
+
+def check_running_metrics_match_print():
+    """
+    Running_metrics updated during a backtest give the numbers of BackTester.print on the trade frame
+    """
+    prices = np.round(50 + 10 * np.sin(np.arange(301) / 10.) + np.arange(301) / 50., 1)
+    process = Replay_process(np.arange(301), prices)
+    player = Player(process, functools.partial(Generic_functions.utility_function, k=0.0001),
+                    functools.partial(Generic_functions.trading_cost, mul=10, ts=0.1),
+                    Strategy(SLA(), rng=Random_source(8)), model='sla')
+    tester = BackTester(process, player)
+    metrics = Running_metrics(initial_value=1e5)
+    # trade randomly, so that there are trades, costs and a draw down
+    player.strategy.learner.predict = lambda state, actions: actions[player.strategy.rng.integers(len(actions))]
+    tester.backtest(total_time=300, initial_value=1e5, metrics=metrics)
+    printed = tester.print().loc['Player']
+    for name, value in metrics.summary().items():
+        assert np.isclose(value, float(printed[name]), rtol=1e-9, atol=1e-12), '{}: running {}, print {}'.format(
+            name, value, printed[name])
+
+
+checks = [check_evaluation_paths_explore_independently, check_regime_schedule_matches_move_forward,
+          check_backtests_continue_the_trade_log, check_flat_trees_match_sklearn,
+          check_historical_csv_ends_at_its_last_row, check_fast_backtest_on_a_coarse_position_grid,
+          check_tile_coding_compiles_to_a_q_table, check_budget_stops_on_the_time_ordered_tail,
+          check_seeded_learners_own_their_draws, check_running_metrics_match_print]
+
+
+def main(argv=None):
+    failed = 0
+    for check in checks:
+        try:
+            check()
+            print('ok    ', check.__name__)
+        except AssertionError as error:
+            failed += 1
+            print('FAIL  ', check.__name__, error)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+import time budget of each package, measured in a fresh interpreter so nothing is cached in sys.modules
+
+    python -m Test.import_budget
+    python -m Test.import_budget --repeat 5 --output imports.json
+
+a package fails if its median import time exceeds its budget or if it pulls in a module
+that headless runs must not load: plotting, notebook display and ml backends are loaded on first use
+"""
+import sys
+import json
+import argparse
+import subprocess
+import numpy as np
+
+# milliseconds on top of the numpy import every package pays
+budgets = {'Profiling': 50, 'Simulation': 50, 'Model': 100, 'Data': 100, 'BackTester': 600}
+# modules that must only be imported on use
+lazy = ('matplotlib', 'IPython', 'sklearn')
+
+measure = """
+import sys, time, json
+import numpy
+start = time.perf_counter()
+import {package}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1e3, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def import_time(package, repeat):
+    """
+    median import time of a package over fresh interpreters
+    :param package: str, name of the package
+    :param repeat: int, number of interpreters
+    :return: tuple of milliseconds, list of lazy modules that got imported
+    """
+    times, loaded = [], set()
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', measure.format(package=package, lazy=lazy)],
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.splitlines()[-1])
+        times.append(result['ms'])
+        loaded.update(result['loaded'])
+    return float(np.median(times)), sorted(loaded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='check the import time of each package against its budget')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per package')
+    parser.add_argument('--output', help='write the results to this json file')
+    args = parser.parse_args(argv)
+
+    results, failed = {}, False
+    for package, budget in budgets.items():
+        ms, loaded = import_time(package, args.repeat)
+        ok = ms <= budget and not loaded
+        failed = failed or not ok
+        results[package] = {'ms': ms, 'budget_ms': budget, 'loaded': loaded}
+        print('{:<12s} {:>8.1f} ms  budget {:>5d} ms  {}{}'.format(
+            package, ms, budget, 'ok' if ok else 'FAIL', ' loaded ' + ', '.join(loaded) if loaded else ''))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
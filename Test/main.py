@@ -7,12 +7,15 @@ import time
 from Simulation import Ornstein_Uhlenbeck
 from Simulation import Random_mixture_process
 from Simulation import Generic_functions
+from Simulation import Random_source
 from Data import Trade_book
 from Data import Player
 from Model import Strategy
 from Model import SLA
 from Model import RWM
 from Model import FTPL
+from Model import Q_table
+from BackTester import evaluate
 import pandas as pd
 import seaborn as sns
 from scipy import stats
@@ -20,7 +23,7 @@ from scipy import stats
 
 def main():
     np.random.seed(10)
-    ou = Random_mixture_process(p0=70, prob_list=[.25, .25, .25, .25])
+    ou = Random_mixture_process(p0=70, prob_list=[.25, .25, .25, .25], rng=Random_source(10))
     #ou = Ornstein_Uhlenbeck()
     trade_cost = lambda x: Generic_functions.trading_cost(x, 10, 0.1)
     utility_func = lambda x: Generic_functions.utility_function(x, 0.0001)
@@ -28,9 +31,9 @@ def main():
     sla = SLA()
     rwm = RWM()
     ftpl = FTPL()
-    strat_1 = Strategy(sla)
-    strat_2 = Strategy(rwm)
-    strat_3 = Strategy(ftpl)
+    strat_1 = Strategy(sla, rng=Random_source(11))
+    strat_2 = Strategy(rwm, rng=Random_source(12))
+    strat_3 = Strategy(ftpl, rng=Random_source(13))
 
     p1 = Player(price_process=ou, utility_function=utility_func, trading_cost=trade_cost, strategy=strat_3, model='ftpl')
 
@@ -40,11 +43,7 @@ def main():
         for i in range(size):
             p1.trade_greedy_one_step(.9 * 0.9 ** j)
 
-        dates = list(p1.trade_book.book)[:-1]
-        value_list = []
-        for date in dates:
-            value_list.append(p1.trade_book.book[date]['value'])
-        value_array = np.array(value_list)
+        value_array = p1.trade_book.to_arrays()['value'][:-1]
         initial_value = 1000000
         #values = np.cumsum(value_array) + initial_value
         returns = value_array / initial_value
@@ -56,32 +55,8 @@ def main():
         print('iteration:',j+1,'time used is', end - start)
 
 
-    # todo: generate many other price process and compute the sharpe
-    p1.trade_book.clear()
-    pnl = []
-    initial_price = 50
-    initial_time = 0
-    p1.trade_book.add_state(initial_time, initial_price, 0)
-    start = 0
-    test_size = 1000
-    while start != 200:
-        print('iteration:', start+1)
-        test_process = Random_mixture_process(prob_list=[.25, .25, .25, .25], p0 = initial_price, start_t= initial_time)
-        p1.price_process = test_process
-        for j in range(test_size):
-            p1.trade_greedy_one_step(0.01)
-        dates = list(p1.trade_book.book)[:-1]
-        value_list = []
-        for date in dates:
-            value_list.append(p1.trade_book.book[date]['value'])
-        value_array = np.array(value_list)
-        initial_value = 1000000
-        returns = value_array / initial_value
-        sharpe = np.mean(returns) / np.std(returns) * np.sqrt(252)
-        pnl.append(sharpe)
-        p1.update_strategy(test_size, 1)
-        start += 1
-        initial_time, _ = p1.price_process.get_current_price()
+    # sharpe of the trained player on many other price processes
+    pnl = evaluate(p1, n_paths=200, test_size=1000, seed=10)['sharpe']
 
 
     plt.figure()
@@ -89,35 +64,22 @@ def main():
     plt.show()
 
 
+    # compile the learner once on the grid of both plots
+    actions = [200, 100, 0, -100, -200]
     a = np.linspace(start=0, stop=100, num=41)
-    b = []
-    for i in a:
-        b.append(p1.strategy.learner.predict((i, 500), [200, 100, 0, -100, -200]))
+    price = np.linspace(start=0,stop=100,num=21)
+    q_table = Q_table.compile(p1.strategy.learner, prices=np.union1d(a, price), positions=[0, 500], actions=actions)
 
+    b = q_table.actions[np.argmax(q_table.surface(500, a), axis=1)]
     plt.figure()
     plt.plot(a,b)
     plt.show(block = True)
 
-    price = np.linspace(start=0,stop=100,num=21)
-    q200 = []
-    q100 = []
-    q0 = []
-    qn100 = []
-    qn200 = []
-
     pos = 0
-    for p in price:
-        q200.append(p1.strategy.learner.qval((p, pos),[200]))
-        q100.append(p1.strategy.learner.qval((p, pos),[100]))
-        q0.append(p1.strategy.learner.qval((p, pos),[0]))
-        qn100.append(p1.strategy.learner.qval((p, pos),[-100]))
-        qn200.append(p1.strategy.learner.qval((p, pos),[-200]))
+    q = q_table.surface(pos, price)
     plt.figure()
-    plt.plot(price, q200, label = '200')
-    plt.plot(price, q100, label = '100')
-    plt.plot(price, q0, label = '0')
-    plt.plot(price, qn100, label = '-100')
-    plt.plot(price, qn200, label = '-200')
+    for k in range(len(actions)):
+        plt.plot(price, q[:, k], label = str(actions[k]))
     plt.legend(loc=0)
     plt.show(block = True)
 
@@ -0,0 +1,29 @@
+"""
+hyperparameter sweep of train plus evaluate runs, results are cached so reruns only run the missing cells
+
+    python -m Test.sweep --grid '{"model": ["rwm", "ftpl"], "gamma": [0.99, 0.999]}' --seeds 0 1 --output sweep.csv
+"""
+import sys
+import json
+import argparse
+from BackTester import sweep, grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run a parameter grid over a process pool with a result cache')
+    parser.add_argument('--grid', default='{}', help='json object of parameter name: list of values')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--cache', default='sweep_cache', help='directory of the cached results')
+    parser.add_argument('--n-jobs', type=int, help='worker processes, all cpus if not given')
+    parser.add_argument('--output', help='write the results table to this csv file')
+    args = parser.parse_args(argv)
+
+    results = sweep(grid(**json.loads(args.grid)), seeds=args.seeds, cache_dir=args.cache, n_jobs=args.n_jobs)
+    print(results.drop(columns='key').to_string())
+    if args.output:
+        results.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())